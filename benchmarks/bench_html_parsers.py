@@ -0,0 +1,93 @@
+"""Compare NOTAM page extraction backends (lxml vs BeautifulSoup html.parser).
+
+Usage: python benchmarks/bench_html_parsers.py [--faa saved_faa.html] [--ourairports saved_ourairports.html] [--scale N]
+
+Without saved pages, FAA and OurAirports style pages are generated from notam_data.csv,
+with the rows repeated --scale times to approximate a large FIR page such as OIIX.
+Peak memory comes from tracemalloc and only covers the Python heap, so it understates
+what lxml allocates in C; compare it together with the parse time.
+"""
+import argparse
+import csv
+import html
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import notam_html
+from notam_html import faa_notam_cells, ourairports_notam_texts
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def load_notam_texts(csv_file):
+    texts = []
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            texts.append((row['ICAO'], f"{row['NOTAM No']} NOTAMN Q) {row['Q Code']} A) {row['ICAO']} "
+                                       f"B) {row['From']} C) {row['To']} E) {row['Text']}"))
+    return texts
+
+
+def build_faa_page(texts):
+    rows = ''.join(f"<tr><td>{html.escape(icao)}</td><td><pre>{html.escape(text)}</pre></td></tr>\n" for icao, text in texts)
+    return ("<html><body><form id='form1'><div><table><tr><td>"
+            "<table><tr><td>header</td></tr></table><table><tr><td>query</td></tr></table>"
+            f"<table><tr><th>Location</th><th>NOTAM</th></tr>\n{rows}</table>"
+            "</td></tr></table></div></form></body></html>")
+
+
+def build_ourairports_page(texts):
+    sections = ''.join(f"<section id='notam-{i}'><h3>{html.escape(icao)}</h3><p>{html.escape(text)}</p></section>\n"
+                       for i, (icao, text) in enumerate(texts))
+    return f"<html><body><main>{sections}</main></body></html>"
+
+
+def measure(func, page, backend, repeat):
+    tracemalloc.start()
+    result = func(page, backend=backend)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(page, backend=backend)
+    elapsed = (time.perf_counter() - start) / repeat
+    return result, elapsed, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--faa", help="saved FAA DINS result page")
+    parser.add_argument("--ourairports", help="saved OurAirports NOTAM page")
+    parser.add_argument("--csv", default=os.path.join(REPO_DIR, "notam_data.csv"), help="rows used to generate pages")
+    parser.add_argument("--scale", type=int, default=10, help="times the CSV rows are repeated in generated pages")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = load_notam_texts(args.csv) * args.scale
+    pages = []
+    for path, builder, func in [(args.faa, build_faa_page, faa_notam_cells),
+                                (args.ourairports, build_ourairports_page, ourairports_notam_texts)]:
+        if path:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                pages.append((os.path.basename(path), f.read(), func))
+        else:
+            pages.append((f"generated {func.__name__}", builder(texts), func))
+
+    backends = ["bs4"] + (["lxml"] if notam_html.lxml_html is not None else [])
+    if len(backends) == 1:
+        print("lxml is not installed, only the BeautifulSoup backend is measured")
+
+    for name, page, func in pages:
+        print(f"{name}: {len(page) / 1024:.0f} KiB")
+        baseline = None
+        for backend in backends:
+            result, elapsed, peak = measure(func, page, backend, args.repeat)
+            if baseline is None:
+                baseline = (result, elapsed)
+            same = "same output" if result == baseline[0] else "OUTPUT DIFFERS"
+            print(f"  {backend:5s} {elapsed * 1000:8.1f} ms  peak {peak / 1024 / 1024:7.1f} MiB  "
+                  f"{baseline[1] / elapsed:5.1f}x  {len(result or [])} NOTAMs, {same}")
@@ -0,0 +1,99 @@
+"""Compare the old pandas reload-sort-rewrite merge with the incremental store merge.
+
+Usage: python benchmarks/bench_merge.py [sizes] [fetched rows]
+e.g.   python benchmarks/bench_merge.py 10000,100000,1000000 2000
+
+For each archive size a synthetic notam_data.csv / store is built, then a fetch of
+`fetched rows` NOTAMs (a dozen new, a few changed, the rest unchanged) is merged.
+The incremental time is split into applying the changes and exporting the CSV.
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from notam_store import CSV_FIELDS, NotamStore
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+def legacy_merge(new_data_files, output_file):
+    """merge_and_remove_duplicates as it was before the NOTAM store."""
+    new_data = pd.concat([pd.read_csv(new_file) for new_file in new_data_files], ignore_index=True)
+    if os.path.exists(output_file):
+        combined_data = pd.concat([pd.read_csv(output_file), new_data], ignore_index=True)
+    else:
+        combined_data = new_data
+    combined_data['Farsi'] = combined_data['Farsi'].fillna('')
+    combined_data.sort_values(by='Farsi', ascending=False, inplace=True)
+    deduplicated_data = combined_data.drop_duplicates(subset=['ICAO', 'NOTAM No'], keep='first')
+    deduplicated_data.to_csv(output_file, index=False)
+
+
+def make_row(index, farsi=''):
+    return {
+        'ICAO': f"O{chr(65 + index % 26)}{chr(65 + index // 26 % 26)}{chr(65 + index // 676 % 26)}",
+        'NOTAM No': f"A{index % 10000:04d}/{index // 10000 % 100:02d}",
+        'Q Code': 'OIIX/QMRLC/IV/NBO/A/000/999/',
+        'From': '2412240531',
+        'To': '2501131000 EST',
+        'Schedule': '',
+        'Text': f"RWY {index % 36:02d} CLSD DUE TO WIP. CREATED: 24 Dec 2024 05:31:00 SOURCE: OIIIYNYX",
+        'Lower Limit': '',
+        'Upper Limit': '',
+        'Created Time': '24 Dec 2024 05:31:00',
+        'Farsi': farsi,
+    }
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run(size, fetched, directory):
+    archive = [make_row(i, farsi='ترجمه' if i % 3 else '') for i in range(size)]
+    fetch = [make_row(i) for i in random.sample(range(size), fetched - 12)]
+    fetch += [make_row(size + i) for i in range(12)]
+    for row in fetch[:5]:
+        row['Text'] += ' AMENDED'
+
+    fetch_file = os.path.join(directory, f"fetch_{size}.csv")
+    csv_file = os.path.join(directory, f"notam_data_{size}.csv")
+    write_csv(fetch_file, fetch)
+    write_csv(csv_file, archive)
+
+    store = NotamStore(os.path.join(directory, f"notam_data_{size}.sqlite"))
+    store.upsert(archive)
+
+    start = time.perf_counter()
+    with open(fetch_file, newline='', encoding='utf-8') as f:
+        counts = store.merge(csv.DictReader(f))
+    merged = time.perf_counter()
+    store.export_csv(csv_file)
+    exported = time.perf_counter()
+    store.close()
+    print(f"{size:>9} rows  incremental: merge {(merged - start) * 1000:8.1f} ms, export {(exported - merged) * 1000:8.1f} ms  {counts}")
+
+    if pd is not None:
+        write_csv(csv_file, archive)
+        start = time.perf_counter()
+        legacy_merge([fetch_file], csv_file)
+        print(f"{size:>9} rows  legacy pandas reload-sort-rewrite: {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in (sys.argv[1] if len(sys.argv) > 1 else "10000,100000,1000000").split(',')]
+    fetched = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            run(size, min(fetched, size), directory)
@@ -0,0 +1,92 @@
+"""Micro-benchmark for NOTAM field extraction over the rows of notam_data.csv.
+
+Usage: python benchmarks/bench_notam_fields.py [notam_data.csv] [repeat]
+"""
+import csv
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from notam_fields import extract_notam_fields
+
+
+def legacy_extract_notam_fields(notam_text):
+    """The per-field regex implementation the fetch scripts used before notam_fields.py."""
+    notam_data = {
+        'NOTAM No': '',
+        'Q Code': '',
+        'From': '',
+        'To': '',
+        'Schedule': '',
+        'Text': '',
+        'Lower Limit': '',
+        'Upper Limit': '',
+        'Created Time': '',
+        'Farsi': ''
+    }
+
+    notam_text = re.sub(r'\s+', ' ', notam_text)
+
+    patterns = {
+        'NOTAM No': re.compile(r'([A-Z]\d{4}/\d{2})'),
+        'Q Code': re.compile(r'Q\) (.+?)(?=[A-Z]\)|\Z)'),
+        'From': re.compile(r'B\) (\d{10})'),
+        'To': re.compile(r'C\) (\d{10}(?:\sEST)?|PERM)'),
+        'Schedule': re.compile(r'D\) (.+?)(?=[A-Z]\)|\Z)'),
+        'Text': re.compile(r'E\) (.+?)(?=[A-Z]\)|\Z)'),
+        'Lower Limit': re.compile(r'F\) (\S+)'),
+        'Upper Limit': re.compile(r'G\) (\S+)')
+    }
+
+    for key, pattern in patterns.items():
+        match = pattern.search(notam_text)
+        if match:
+            notam_data[key] = match.group(1).strip()
+
+    created_match = re.search(r'CREATED:\s*(\d{2}\s\w{3}\s\d{4}\s\d{2}:\d{2}:\d{2})', notam_text)
+    if created_match:
+        notam_data['Created Time'] = created_match.group(1)
+
+    return notam_data
+
+
+def load_raw_notams(csv_file):
+    """Rebuild raw ICAO-format NOTAM text from the parsed rows of a NOTAM CSV."""
+    raw_notams = []
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            parts = [f"{row['NOTAM No']} NOTAMN", f"Q) {row['Q Code']}", f"A) {row['ICAO']}", f"B) {row['From']}", f"C) {row['To']}"]
+            if row['Schedule']:
+                parts.append(f"D) {row['Schedule']}")
+            parts.append(f"E) {row['Text']}")
+            if row['Lower Limit']:
+                parts.append(f"F) {row['Lower Limit']}")
+            if row['Upper Limit']:
+                parts.append(f"G) {row['Upper Limit']}")
+            raw_notams.append(' '.join(parts))
+    return raw_notams
+
+
+def measure(func, raw_notams, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for notam_text in raw_notams:
+            func(notam_text)
+    elapsed = time.perf_counter() - start
+    return len(raw_notams) * repeat / elapsed
+
+
+if __name__ == "__main__":
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'notam_data.csv')
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    raw_notams = load_raw_notams(csv_file)
+    mismatches = sum(1 for text in raw_notams if legacy_extract_notam_fields(text) != extract_notam_fields(text))
+    print(f"{len(raw_notams)} NOTAMs, {mismatches} results differ between implementations")
+
+    legacy_rate = measure(legacy_extract_notam_fields, raw_notams, repeat)
+    rate = measure(extract_notam_fields, raw_notams, repeat)
+    print(f"before (per-field regex):  {legacy_rate:10.0f} NOTAMs/sec")
+    print(f"after  (single-pass scan): {rate:10.0f} NOTAMs/sec  ({rate / legacy_rate:.2f}x)")
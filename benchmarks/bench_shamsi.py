@@ -0,0 +1,68 @@
+"""Benchmark Shamsi conversion of the From/To columns of notam_data.csv.
+
+Compares the original per-call conversion, the memoized convert_to_shamsi and the
+column converter convert_many_to_shamsi (list and pandas Series input).
+
+Usage: python benchmarks/bench_shamsi.py [notam_data.csv] [copies]
+"""
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shamsi_date import convert_many_to_shamsi, convert_to_shamsi
+
+GMT_DIFFERENCE = 3.5
+
+
+def per_call(values, convert):
+    """What the bot did before: one conversion per value, errors shown as 'Invalid date'."""
+    results = []
+    for value in values:
+        if value == 'N/A':
+            results.append('N/A')
+            continue
+        try:
+            results.append(convert(value, GMT_DIFFERENCE))
+        except Exception:
+            results.append('Invalid date')
+    return results
+
+
+def timed(label, func, baseline=None):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    speedup = f"  ({baseline / elapsed:.1f}x)" if baseline else ""
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms{speedup}")
+    return result, elapsed
+
+
+def main():
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else "notam_data.csv"
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    df = pd.read_csv(csv_file, dtype=str, keep_default_na=False)
+    column = pd.concat([df['From'], df['To']] * copies, ignore_index=True)
+    values = column.tolist()
+    print(f"{len(values)} values, {column.nunique()} distinct")
+
+    uncached = convert_to_shamsi.__wrapped__
+    expected, baseline = timed("per call, no cache", lambda: per_call(values, uncached))
+
+    convert_to_shamsi.cache_clear()
+    result, _ = timed("per call, memoized", lambda: per_call(values, convert_to_shamsi), baseline)
+    assert result == expected
+
+    convert_to_shamsi.cache_clear()
+    result, _ = timed("convert_many_to_shamsi(list)", lambda: convert_many_to_shamsi(values, GMT_DIFFERENCE), baseline)
+    assert result == expected
+
+    convert_to_shamsi.cache_clear()
+    result, _ = timed("convert_many_to_shamsi(Series)", lambda: convert_many_to_shamsi(column, GMT_DIFFERENCE), baseline)
+    assert result.tolist() == expected
+
+
+if __name__ == "__main__":
+    main()
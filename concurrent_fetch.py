@@ -0,0 +1,86 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# Defaults used by the fetch scripts; both can be overridden on the command line
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RATE_PER_HOST = 4.0  # requests per second to a single host, 0 disables
+
+
+class HostRateLimiter:
+    """Space out requests so that each host sees at most `rate` requests per second."""
+
+    def __init__(self, rate=DEFAULT_RATE_PER_HOST):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        """Block the calling thread until it may send a request to the host of `url`."""
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def fetch_in_order(items, fetch_func, max_workers=DEFAULT_MAX_WORKERS):
+    """Apply `fetch_func` to every item with at most `max_workers` calls in flight.
+
+    Results are yielded in the same order as `items`, so callers writing CSV rows
+    keep a deterministic output regardless of which request finishes first.
+    """
+    if max_workers <= 1:
+        for item in items:
+            yield fetch_func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(fetch_func, items)
+
+
+def fetch_and_parse_in_order(items, fetch_func, parse_func, max_workers=DEFAULT_MAX_WORKERS, parse_workers=0, load_parsed=None):
+    """Fetch every item on a thread pool and parse the pages, yielding
+    (item, content, rows, reused) in the same order as `items`.
+
+    `fetch_func(item)` returns the page content or None. With `parse_workers` > 0 each page
+    is queued on a ProcessPoolExecutor running `parse_func(content, item)` as soon as it is
+    downloaded, so parsing overlaps the remaining downloads and runs on several cores; the
+    caller stays the single writer. The workers are started by a fork server (spawned where
+    there is none), never forked from this process while fetch threads hold locks.
+    Otherwise pages are parsed in the calling thread.
+    `load_parsed(item, content)` may return previously parsed rows to skip parsing (reused=True).
+    """
+    parse_pool = None
+    if parse_workers > 0:
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        parse_pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context(start_method))
+
+    def fetch_stage(item):
+        content = fetch_func(item)
+        if not content:
+            return item, content, None, False
+        rows = load_parsed(item, content) if load_parsed else None
+        if rows is not None:
+            return item, content, rows, True
+        if parse_pool:
+            return item, content, parse_pool.submit(parse_func, content, item), False
+        return item, content, None, False
+
+    try:
+        for item, content, rows, reused in fetch_in_order(items, fetch_stage, max_workers=max_workers):
+            if isinstance(rows, Future):
+                rows = rows.result()
+            elif content and rows is None:
+                rows = parse_func(content, item)
+            yield item, content, rows, reused
+    finally:
+        if parse_pool:
+            parse_pool.shutdown(cancel_futures=True)
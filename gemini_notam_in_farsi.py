@@ -1,8 +1,19 @@
 import pandas as pd
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+import asyncio
 import logging
+import random
+import signal
 import time
 import os
+import re
+import json
+import argparse
+from glossary import Glossary
+from token_bucket import TokenBucket
+from notam_store import DEFAULT_DB_FILE, NotamStore
+from translation_cache import DEFAULT_CACHE_FILE, TranslationCache, dictionary_version, translation_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s')
@@ -11,6 +22,24 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(m
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 genai.configure(api_key=GEMINI_API_KEY)
 
+MODEL_NAME = "gemini-pro"
+DEFAULT_BATCH_SIZE = 10  # NOTAMs packed into one request, 1 sends one request per NOTAM
+DEFAULT_CONCURRENCY = 4  # requests in flight at once
+DEFAULT_RPM = 60  # requests per minute allowed by the API key's quota, 0 disables
+DEFAULT_TPM = 32000  # tokens per minute allowed by the API key's quota, 0 disables
+DEFAULT_CHECKPOINT_ROWS = 200  # save finished translations after this many rows...
+DEFAULT_CHECKPOINT_SECONDS = 30.0  # ...or this many seconds, whichever comes first
+MAX_RETRIES = 5  # attempts after a 429 before a request is given up
+
+_model = None
+
+def get_model():
+    """Create the Gemini model once and reuse it for every request."""
+    global _model
+    if _model is None:
+        _model = genai.GenerativeModel(MODEL_NAME)
+    return _model
+
 def load_dictionary(dict_file):
     """Load the English-to-Farsi dictionary from a CSV file."""
     dictionary = {}
@@ -20,19 +49,22 @@ def load_dictionary(dict_file):
             dictionary = pd.Series(df['Farsi'].values, index=df['English']).to_dict()
     return dictionary
 
+def build_prompt(text, dictionary):
+    return (
+        f"""
+        Please provide a short concisely and clearly description, using aviation terminology and phrases, for the following NOTAM (Notice to Airmen) in Farsi(Persian), keep the english aviation terminology :
+        '{text}'.
+        there is no need for date/time expression/conversion, no need for saying Creation date/time and the source (OIIIYNYX) .
+        Use the following English-to-Farsi(or English abbreviation) dictionary for specific terms:
+        {dictionary}
+        """
+    )
+
 def get_farsi_translation(text, dictionary):
     """Connect to Gemini API and get the Farsi translation."""
     try:
-        model = genai.GenerativeModel("gemini-pro")
-        prompt = (
-            f"""
-            Please provide a short concisely and clearly description, using aviation terminology and phrases, for the following NOTAM (Notice to Airmen) in Farsi(Persian), keep the english aviation terminology :
-            '{text}'.
-            there is no need for date/time expression/conversion, no need for saying Creation date/time and the source (OIIIYNYX) .
-            Use the following English-to-Farsi(or English abbreviation) dictionary for specific terms:
-            {dictionary}
-            """
-        )
+        model = get_model()
+        prompt = build_prompt(text, dictionary)
 
         logging.info("Sending request to Gemini API...")
         response = model.generate_content(prompt)
@@ -42,59 +74,283 @@ def get_farsi_translation(text, dictionary):
         logging.error(f"Error with Gemini API: {e}")
         return ""
 
-def update_farsi_column(csv_file, dict_file):
-    """Update the 'Farsi' column for rows where it is empty or nan."""
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token) reserved from the TPM quota before a request."""
+    return len(text) // 4 + 1
+
+class GeminiRateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets shared by all translation workers."""
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._resume_at = 0.0
+
+    async def acquire(self, tokens):
+        delay = self._resume_at - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._resume_at - time.monotonic()
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+    def back_off(self, delay):
+        """Hold back every worker for `delay` seconds after the API answered 429."""
+        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+async def generate_async(prompt, limiter):
+    """Send `prompt` within the quota and return the answer text, retrying 429s with exponential backoff."""
+    reserved = estimate_tokens(prompt)
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.acquire(reserved)
+        try:
+            response = await get_model().generate_content_async(prompt)
+        except (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = min(2 ** attempt, 60) * random.uniform(1.0, 1.5)
+            logging.warning(f"Gemini API rate limit hit, retrying in {delay:.1f}s: {e}")
+            limiter.back_off(delay)
+            continue
+        usage = getattr(response, 'usage_metadata', None)
+        if usage and usage.total_token_count:
+            limiter.tokens.adjust(usage.total_token_count - reserved)
+        return response.text.strip()
+
+async def get_farsi_translation_async(text, dictionary, limiter):
+    """Async get_farsi_translation going through the shared rate limiter."""
+    try:
+        logging.info("Sending request to Gemini API...")
+        translation = await generate_async(build_prompt(text, dictionary), limiter)
+        logging.info("Received response from Gemini API.")
+        return translation
+    except Exception as e:
+        logging.error(f"Error with Gemini API: {e}")
+        return ""
+
+def build_batch_prompt(items, dictionary):
+    """Prompt asking for the Farsi description of several NOTAMs, answered as JSON keyed by id."""
+    notams = json.dumps([{"id": item_id, "text": text} for item_id, text in items], ensure_ascii=False, indent=1)
+    return (
+        f"""
+        Please provide a short concisely and clearly description, using aviation terminology and phrases, for each of the following NOTAMs (Notice to Airmen) in Farsi(Persian), keep the english aviation terminology.
+        there is no need for date/time expression/conversion, no need for saying Creation date/time and the source (OIIIYNYX) .
+        Use the following English-to-Farsi(or English abbreviation) dictionary for specific terms:
+        {dictionary}
+        The NOTAMs are given as a JSON list of objects with an "id" and a "text".
+        Answer with only a JSON object that maps every id to its Farsi description, e.g. {{"0": "...", "1": "..."}}.
+        {notams}
+        """
+    )
+
+def parse_batch_response(response_text, ids):
+    """Return {id: translation} from a JSON batch answer; None if the answer is not a JSON object."""
+    match = re.search(r'\{.*\}', response_text, re.DOTALL)  # tolerate ```json fences around the object
+    if not match:
+        return None
+    try:
+        answer = json.loads(match.group())
+    except ValueError:
+        return None
+    if not isinstance(answer, dict):
+        return None
+    translations = {}
+    for item_id in ids:
+        translation = answer.get(item_id)
+        if isinstance(translation, str) and translation.strip():
+            translations[item_id] = translation.strip()
+    return translations
+
+async def get_farsi_translations_async(items, dictionary, limiter):
+    """Translate (id, text) pairs with one Gemini request.
+
+    NOTAMs missing from a malformed or incomplete answer are translated one by one.
+    If the request itself fails, nothing is returned and the NOTAMs are left for the next run.
+    """
+    ids = [item_id for item_id, _ in items]
+    try:
+        logging.info(f"Sending batch of {len(items)} NOTAMs to Gemini API...")
+        answer = await generate_async(build_batch_prompt(items, dictionary), limiter)
+        logging.info("Received response from Gemini API.")
+    except Exception as e:
+        logging.error(f"Error with Gemini API: {e}")
+        return {}
+
+    translations = parse_batch_response(answer, ids)
+    if translations is None:
+        logging.warning("Malformed batch answer, falling back to one request per NOTAM.")
+        translations = {}
+    missing = [(item_id, text) for item_id, text in items if item_id not in translations]
+    if missing and len(missing) < len(items):
+        logging.warning(f"{len(missing)} NOTAMs missing from the batch answer, translating them one by one.")
+    for item_id, text in missing:
+        translation = await get_farsi_translation_async(text, dictionary, limiter)
+        if translation:
+            translations[item_id] = translation
+    return translations
+
+class TranslationCheckpointer:
+    """Buffer finished translations and save them to the store and cache in batches."""
+
+    def __init__(self, store, cache, dict_version, every_rows=DEFAULT_CHECKPOINT_ROWS, every_seconds=DEFAULT_CHECKPOINT_SECONDS):
+        self.store = store
+        self.cache = cache
+        self.dict_version = dict_version
+        self.every_rows = every_rows
+        self.every_seconds = every_seconds
+        self.saved = 0
+        self._texts = []
+        self._updates = []
+        self._last = time.monotonic()
+
+    def add(self, text, rows, farsi):
+        self._texts.append((text, farsi))
+        self._updates.extend((row['ICAO'], row['NOTAM No'], farsi) for row in rows)
+        if len(self._updates) >= self.every_rows or time.monotonic() - self._last >= self.every_seconds:
+            self.flush()
+
+    def flush(self):
+        if self._updates:
+            self.cache.put_many(self._texts, self.dict_version)
+            self.store.set_farsi(self._updates)
+            self.saved += len(self._updates)
+            logging.info(f"Checkpoint: saved {len(self._updates)} rows ({self.saved} so far)")
+        self._texts, self._updates = [], []
+        self._last = time.monotonic()
+
+async def update_farsi_column_async(csv_file, dict_file, db_file=DEFAULT_DB_FILE, batch_size=DEFAULT_BATCH_SIZE, cache_file=DEFAULT_CACHE_FILE,
+                                    concurrency=DEFAULT_CONCURRENCY, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM,
+                                    checkpoint_rows=DEFAULT_CHECKPOINT_ROWS, checkpoint_seconds=DEFAULT_CHECKPOINT_SECONDS,
+                                    store=None, cache=None, handle_signals=False):
+    """Translate untranslated rows with up to `concurrency` requests in flight within the RPM/TPM quota.
+
+    Finished translations are saved every `checkpoint_rows` rows or `checkpoint_seconds`
+    seconds, and once more when done or cancelled; with `handle_signals` (the CLI), SIGINT
+    and SIGTERM stop the workers too. The CSV is exported at the end (skipped when
+    `csv_file` is None). A long-running caller can pass its open NotamStore and
+    TranslationCache, which are then left open, and keeps its own signal handlers.
+    """
+    # Read and write through the NOTAM store; the CSV is exported at the end
+    own_store = store is None
+    if own_store:
+        store = NotamStore(db_file)
+        store.import_csv_if_empty(csv_file)
+
+    # Load the dictionary; each prompt only carries the entries found in its NOTAMs
+    dictionary = load_dictionary(dict_file)
+    glossary = Glossary(dictionary)
+    full_dictionary_tokens = estimate_tokens(str(dictionary))
+    prompt_tokens = {'requests': 0, 'full': 0, 'sent': 0}
+
+    # Texts translated before (under any ICAO or NOTAM number) are taken from the cache
+    own_cache = cache is None
+    if own_cache:
+        cache = TranslationCache(cache_file)
+    dict_version = dictionary_version(dict_file)
+    cached = cache.apply_to_store(store, dict_version)
+    if cached:
+        logging.info(f"Filled {cached} rows from the translation cache")
+
+    # Identify rows where 'Farsi' is still empty, and translate each distinct text once
+    rows_to_update = store.untranslated()
+    pending = {}
+    for row in rows_to_update:
+        key = translation_key(row['Text'], dict_version)
+        pending.setdefault(key, (row['Text'], []))[1].append(row)
+    pending = list(pending.values())
+
+    # Log the total number of rows to be processed
+    logging.info(f"Total rows to process: {len(rows_to_update)} ({len(pending)} distinct texts)")
+
+    limiter = GeminiRateLimiter(rpm, tpm)
+    checkpointer = TranslationCheckpointer(store, cache, dict_version, checkpoint_rows, checkpoint_seconds)
+
+    # Batches of up to batch_size NOTAMs per request, shared by all workers
+    batch_size = max(batch_size, 1)
+    batches = ((start, pending[start:start + batch_size]) for start in range(0, len(pending), batch_size))
+
+    async def worker():
+        for start, batch in batches:
+            logging.info(f"Processing texts {start + 1}-{start + len(batch)} of {len(pending)}")
+            items = [(str(index), text) for index, (text, _) in enumerate(batch)]
+            terms = glossary.entries_for(text for _, text in items)
+            prompt_tokens['requests'] += 1
+            prompt_tokens['full'] += full_dictionary_tokens
+            prompt_tokens['sent'] += estimate_tokens(str(terms))
+
+            # Get the Farsi translations from Gemini API
+            if batch_size == 1:
+                translation = await get_farsi_translation_async(items[0][1], terms, limiter)
+                translations = {items[0][0]: translation} if translation else {}
+            else:
+                translations = await get_farsi_translations_async(items, terms, limiter)
+
+            for (item_id, _), (text, rows) in zip(items, batch):
+                if item_id in translations:
+                    checkpointer.add(text, rows, translations[item_id])
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(concurrency, 1))]
+
+    def shutdown():
+        logging.warning("Stopping: saving the translations finished so far")
+        for task in workers:
+            task.cancel()
+
+    loop = asyncio.get_running_loop()
+    signals = {}
+    for sig in (signal.SIGINT, signal.SIGTERM) if handle_signals else ():
+        try:
+            previous = signal.getsignal(sig)
+            loop.add_signal_handler(sig, shutdown)
+            signals[sig] = previous
+        except (NotImplementedError, RuntimeError, ValueError):  # Windows, or not running in the main thread
+            pass
+
     try:
-        # Load the CSV file
-        df = pd.read_csv(csv_file)
-        
-        # Ensure 'Farsi' column exists
-        if 'Farsi' not in df.columns:
-            df['Farsi'] = ""
-
-        # Load the dictionary
-        dictionary = load_dictionary(dict_file)
-
-        # Identify rows where 'Farsi' is empty or nan
-        rows_to_update = df[df['Farsi'].isna() | df['Farsi'].eq("")]
-        
-        # Log the total number of rows to be processed
-        logging.info(f"Total rows to process: {len(rows_to_update)}")
-        
-        # Iterate through the rows and update 'Farsi' column
-        for index, row in rows_to_update.iterrows():
-            logging.info(f"Processing row index: {index}")
-            text = row['Text']
-            #schedule = row['Schedule'] if pd.notna(row['Schedule']) else ''
-            #lower_limit = row['Lower Limit'] if pd.notna(row['Lower Limit']) else ''
-            #upper_limit = row['Upper Limit'] if pd.notna(row['Upper Limit']) else ''
-            #from_date = row['From'] if pd.notna(row['From']) else ''
-            #to_date = row['To'] if pd.notna(row['To']) else ''
-
-            # Combine the relevant fields into a single text block
-            combined_text = f"{text}"
-
-            #combined_text = f"{text}\nSchedule: {schedule}\nLower Limit: {lower_limit}\nUpper Limit: {upper_limit}\nFrom: {from_date}\nTo: {to_date}"
-
-            # Get the Farsi translation from Gemini API
-            translation = get_farsi_translation(combined_text, dictionary)
-
-            if translation:
-                df.at[index, 'Farsi'] = translation
-                logging.info(f"Updated row index: {index}")
-                # Save the file after each successful update
-                df.to_csv(csv_file, index=False)
-                time.sleep(1)  # Add delay to avoid rate limits
-
-        logging.info("Farsi column updated successfully!")
+        results = await asyncio.gather(*workers, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logging.error(f"Translation worker failed: {result}")
+    finally:
+        for sig, previous in signals.items():
+            loop.remove_signal_handler(sig)
+            if previous is not None:  # None: installed outside Python, cannot be restored
+                signal.signal(sig, previous)
+        checkpointer.flush()
+        if prompt_tokens['full']:
+            saved = prompt_tokens['full'] - prompt_tokens['sent']
+            logging.info(f"Glossary: ~{prompt_tokens['sent']} of ~{prompt_tokens['full']} dictionary tokens sent in {prompt_tokens['requests']} requests "
+                         f"(~{saved} tokens, {saved / prompt_tokens['full'] * 100:.1f}% saved)")
+        logging.info(f"Translation cache: {cache.stats()}")
+        if own_cache:
+            cache.close()
+        if csv_file:
+            store.export_csv(csv_file)
+        if own_store:
+            store.close()
+    logging.info("Farsi column updated successfully!")
 
+def update_farsi_column(csv_file, dict_file, db_file=DEFAULT_DB_FILE, batch_size=DEFAULT_BATCH_SIZE, cache_file=DEFAULT_CACHE_FILE, **engine_options):
+    """Update the 'Farsi' column for rows where it is empty."""
+    try:
+        asyncio.run(update_farsi_column_async(csv_file, dict_file, db_file, batch_size, cache_file, **engine_options))
     except Exception as e:
         logging.error(f"Error updating Farsi column: {e}")
 
-def main(csv_file, dict_file):
-    update_farsi_column(csv_file, dict_file)
+def main(csv_file, dict_file, batch_size=DEFAULT_BATCH_SIZE, **engine_options):
+    update_farsi_column(csv_file, dict_file, batch_size=batch_size, handle_signals=True, **engine_options)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Translate untranslated NOTAMs to Farsi with Gemini")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"NOTAMs per Gemini request (default: {DEFAULT_BATCH_SIZE}, 1 for one request per NOTAM)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"Gemini requests in flight at once (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_RPM, help=f"Requests per minute allowed by your quota (default: {DEFAULT_RPM}, 0 disables)")
+    parser.add_argument("--tpm", type=float, default=DEFAULT_TPM, help=f"Tokens per minute allowed by your quota (default: {DEFAULT_TPM}, 0 disables)")
+    parser.add_argument("--checkpoint-rows", type=int, default=DEFAULT_CHECKPOINT_ROWS, help=f"Save translations after this many rows (default: {DEFAULT_CHECKPOINT_ROWS})")
+    parser.add_argument("--checkpoint-seconds", type=float, default=DEFAULT_CHECKPOINT_SECONDS, help=f"...or after this many seconds (default: {DEFAULT_CHECKPOINT_SECONDS:g})")
+    args = parser.parse_args()
+
     csv_file = "notam_data.csv"
     dict_file = "dict.for.gemini.csv"
-    main(csv_file, dict_file)
+    main(csv_file, dict_file, batch_size=args.batch_size, concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm,
+         checkpoint_rows=args.checkpoint_rows, checkpoint_seconds=args.checkpoint_seconds)
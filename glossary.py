@@ -0,0 +1,81 @@
+from collections import deque
+
+
+def normalize_term(text):
+    """Case and whitespace as the matcher compares them."""
+    return ' '.join(str(text).upper().split())
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+class Glossary:
+    """Aho-Corasick automaton over the English terms of the English-to-Farsi dictionary.
+
+    Built once, it finds every term occurring in a NOTAM in a single pass over the text,
+    however large the dictionary grows. Matches are case-insensitive and must start and
+    end on a token boundary, so 'AD' matches in 'AD CLSD' but not inside 'ADDN' or 'HEAD'.
+    """
+
+    def __init__(self, dictionary):
+        self.dictionary = dictionary
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]  # node -> [(term length, dictionary keys)]
+        keys_by_term = {}
+        for key in dictionary:
+            term = normalize_term(key)
+            if term:
+                keys_by_term.setdefault(term, []).append(key)
+        for term, keys in keys_by_term.items():
+            self._add(term, keys)
+        self._link()
+
+    def _add(self, term, keys):
+        node = 0
+        for char in term:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = child
+        self._output[node].append((len(term), keys))
+
+    def _link(self):
+        """Breadth-first pass setting failure links and merging the outputs along them."""
+        queue = deque(self._goto[0].values())  # depth-1 nodes fail to the root
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text):
+        """Return the set of dictionary keys whose term occurs in `text` on token boundaries."""
+        text = normalize_term(text)
+        found = set()
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, keys in self._output[node]:
+                start = end - length
+                if (start == 0 or not _is_word_char(text[start - 1])) and (end == len(text) or not _is_word_char(text[end])):
+                    found.update(keys)
+        return found
+
+    def entries_for(self, texts):
+        """The part of the dictionary used by any of `texts`, in dictionary order."""
+        found = set()
+        for text in texts:
+            found |= self.find(text)
+        return {key: value for key, value in self.dictionary.items() if key in found}
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+import http_client
+
+# Persistent response cache shared by the NOTAM fetch scripts
+DEFAULT_CACHE_FILE = "http_cache.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # evict least recently used entries above this size
+
+# status is one of: 'fresh' (younger than max_age, no request sent), 'not-modified' (304),
+# 'unchanged' (200 with the same content hash) or 'changed' (new or different body)
+CachedResponse = namedtuple("CachedResponse", ["text", "content_hash", "status"])
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class HttpCache:
+    """On-disk HTTP response cache keyed by URL, with conditional revalidation and LRU eviction."""
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                parsed TEXT,
+                parsed_hash TEXT
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    def _entry(self, url):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT body, etag, last_modified, content_hash, fetched_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+
+    def get(self, url, headers=None, timeout=30, max_age=0, rate_limiter=None):
+        """GET `url`, reusing the cached body when it is younger than `max_age` seconds
+        or when the server confirms it has not changed.
+
+        Raises requests exceptions exactly like `http_client.get`.
+        """
+        entry = self._entry(url)
+        now = time.time()
+        if entry and max_age > 0 and now - entry[4] < max_age:
+            self._touch(url, now)
+            return CachedResponse(entry[0], entry[3], "fresh")
+
+        request_headers = dict(headers or {})
+        if entry:
+            if entry[1]:
+                request_headers["If-None-Match"] = entry[1]
+            if entry[2]:
+                request_headers["If-Modified-Since"] = entry[2]
+
+        if rate_limiter:
+            rate_limiter.wait(url)
+        response = http_client.get(url, headers=request_headers, timeout=timeout)
+
+        if response.status_code == 304 and entry:
+            with self._lock:
+                self._conn.execute("UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+                self._conn.commit()
+            return CachedResponse(entry[0], entry[3], "not-modified")
+
+        response.raise_for_status()
+        body = response.text
+        body_hash = content_hash(body)
+        status = "unchanged" if entry and entry[3] == body_hash else "changed"
+
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO responses (url, body, etag, last_modified, content_hash, fetched_at, accessed_at, size)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(url) DO UPDATE SET
+                       body = excluded.body, etag = excluded.etag, last_modified = excluded.last_modified,
+                       content_hash = excluded.content_hash, fetched_at = excluded.fetched_at,
+                       accessed_at = excluded.accessed_at, size = excluded.size""",
+                (url, body, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                 body_hash, now, now, len(body.encode("utf-8"))),
+            )
+            self._conn.commit()
+        self._evict()
+        return CachedResponse(body, body_hash, status)
+
+    def load_parsed(self, url, body):
+        """Return the rows parsed from `body` on an earlier run, or None if it has to be parsed again."""
+        with self._lock:
+            row = self._conn.execute("SELECT parsed, parsed_hash FROM responses WHERE url = ?", (url,)).fetchone()
+        if row and row[0] is not None and row[1] == content_hash(body):
+            return json.loads(row[0])
+        return None
+
+    def store_parsed(self, url, body, rows):
+        """Remember the rows parsed from `body` so an unchanged page is not parsed again."""
+        parsed = json.dumps(rows, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET parsed = ?, parsed_hash = ?, size = length(CAST(body AS BLOB)) + ? WHERE url = ?",
+                (parsed, content_hash(body), len(parsed.encode("utf-8")), url),
+            )
+            self._conn.commit()
+
+    def _touch(self, url, now):
+        with self._lock:
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url))
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in `max_bytes`."""
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for url, size in self._conn.execute("SELECT url, size FROM responses ORDER BY accessed_at").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                total -= size
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,113 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Keep-alive connections kept per host; hosts not listed here use DEFAULT_POOL_SIZE
+DEFAULT_POOL_SIZE = 10
+HOST_POOL_SIZES = {
+    "https://www.notams.faa.gov": 16,
+    "https://ourairports.com": 16,
+    "https://aviationweather.gov": 4,
+    "https://avwx.rest": 8,
+}
+
+
+class ConnectionStats:
+    """Thread-safe counters for requests sent and TCP/TLS connections opened."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.opened = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_open(self):
+        with self._lock:
+            self.opened += 1
+
+    @property
+    def reused(self):
+        """Requests served over an already open keep-alive connection."""
+        return max(self.requests - self.opened, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {"requests": self.requests, "opened": self.opened, "reused": max(self.requests - self.opened, 0)}
+
+    def __str__(self):
+        stats = self.snapshot()
+        return f"{stats['requests']} requests, {stats['opened']} connections opened, {stats['reused']} reused"
+
+
+stats = ConnectionStats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        stats.record_open()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        stats.record_open()
+        return super()._new_conn()
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that keeps `pool_size` keep-alive connections per host and counts them."""
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, max_retries=0):
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=max_retries)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        stats.record_request()
+        return super().send(request, **kwargs)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.mount("http://", PooledAdapter())
+                session.mount("https://", PooledAdapter())
+                for prefix, pool_size in HOST_POOL_SIZES.items():
+                    session.mount(prefix, PooledAdapter(pool_size))
+                _session = session
+    return _session
+
+
+def set_host_pool_size(prefix, pool_size):
+    """Resize the connection pool for one host, e.g. to match the number of fetch workers."""
+    session = get_session()
+    with _session_lock:
+        HOST_POOL_SIZES[prefix] = pool_size
+        session.mount(prefix, PooledAdapter(pool_size))
+
+
+def get(url, **kwargs):
+    """Send a GET request through the shared keep-alive session."""
+    return get_session().get(url, **kwargs)
+
+
+def connection_stats():
+    """Return a dict with the number of requests, connections opened and connections reused."""
+    return stats.snapshot()
@@ -1,6 +1,9 @@
 import os
-import pandas as pd
+import csv
+import argparse
 import logging
+from notam_store import DEFAULT_DB_FILE, NotamStore
+from translation_cache import DEFAULT_CACHE_FILE as DEFAULT_TRANSLATION_CACHE, TranslationCache, dictionary_version
 
 # Configure logging
 logging.basicConfig(
@@ -8,43 +11,75 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def merge_and_remove_duplicates(new_data_files, output_file):
+def merge_and_remove_duplicates(new_data_files, output_file, db_file=DEFAULT_DB_FILE, prune=False, export=True,
+                                translation_cache_file=DEFAULT_TRANSLATION_CACHE, dict_file="dict.for.gemini.csv",
+                                fetched_icaos=None):
     try:
+        store = NotamStore(db_file)
+
+        # Seed a new store from the existing output file, if there is one
+        imported = store.import_csv_if_empty(output_file)
+        if imported:
+            logging.info(f"Imported {imported} rows from existing {output_file} into {db_file}.")
+
         # Read new data from the input files
-        data_frames = []
+        new_rows = []
         for new_file in new_data_files:
+            if not os.path.exists(new_file):
+                logging.warning(f"{new_file} does not exist, skipping.")
+                continue
             logging.info(f"Reading {new_file}...")
-            df = pd.read_csv(new_file)
-            data_frames.append(df)
-        
-        # Combine new data into one DataFrame
-        logging.info("Combining new data...")
-        new_data = pd.concat(data_frames, ignore_index=True)
-
-        # Check if the output file exists
-        if os.path.exists(output_file):
-            logging.info(f"{output_file} exists. Reading existing data...")
-            existing_data = pd.read_csv(output_file)
-            combined_data = pd.concat([existing_data, new_data], ignore_index=True)
-        else:
-            logging.info(f"{output_file} does not exist. Creating it...")
-            combined_data = new_data
+            with open(new_file, newline='', encoding='utf-8') as f:
+                new_rows.extend(csv.DictReader(f))
 
-        # Remove duplicates, keeping rows where 'Farsi' is not empty
-        logging.info("Removing duplicates...")
-        combined_data['Farsi'] = combined_data['Farsi'].fillna('')
-        combined_data.sort_values(by='Farsi', ascending=False, inplace=True)
-        deduplicated_data = combined_data.drop_duplicates(subset=['ICAO', 'NOTAM No'], keep='first')
+        # Apply only the differences; (ICAO, NOTAM No) is the primary key, so duplicates
+        # collapse, unchanged rows are left alone and an existing Farsi translation is kept
+        logging.info(f"Merging {len(new_rows)} new rows into {db_file}...")
+        counts = store.merge(new_rows, prune=prune, prune_icaos=fetched_icaos)
+        logging.info(f"{counts['inserted']} inserted, {counts['updated']} updated, "
+                     f"{counts['unchanged']} unchanged, {counts['deleted']} deleted.")
 
-        # Save the result back to the output file
-        logging.info(f"Saving deduplicated data to {output_file}...")
-        deduplicated_data.to_csv(output_file, index=False)
+        # NOTAMs that were dropped and fetched again (or re-issued with the same text) get
+        # their translation back from the cache instead of waiting for Gemini
+        filled = 0
+        if (counts['inserted'] or counts['updated']) and os.path.exists(translation_cache_file):
+            cache = TranslationCache(translation_cache_file)
+            filled = cache.apply_to_store(store, dictionary_version(dict_file))
+            cache.close()
+            logging.info(f"Filled {filled} translations from {translation_cache_file}.")
+
+        # Export the CSV for consumers that still read it (atomically, and only when something changed)
+        changed = imported or filled or counts['inserted'] or counts['updated'] or counts['deleted']
+        if not export:
+            logging.info(f"CSV export disabled, {output_file} left as is.")
+        elif changed or not os.path.exists(output_file):
+            logging.info(f"Saving deduplicated data to {output_file}...")
+            store.export_csv(output_file)
+        else:
+            logging.info(f"No changes, {output_file} left as is.")
+        store.close()
 
         logging.info("Merging and deduplication completed successfully!")
     except Exception as e:
         logging.error(f"An error occurred: {e}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge fetched NOTAMs into the NOTAM store and export notam_data.csv")
+    parser.add_argument("--prune", action="store_true", help="delete stored NOTAMs of fetched airports that the sources no longer list")
+    parser.add_argument("--icaos", metavar="ICAO | filename.csv",
+                        help="the ICAO code or CSV file (with an ICAO column) the fetch scripts were run with; "
+                             "with --prune, airports of it that no longer have any NOTAMs are pruned too")
+    parser.add_argument("--no-export", action="store_true", help="only update the store, do not rewrite notam_data.csv")
+    args = parser.parse_args()
+
+    # ICAOs that were fetched, including those without NOTAMs (default: the ICAOs in the input files)
+    fetched_icaos = None
+    if args.icaos and os.path.isfile(args.icaos):
+        with open(args.icaos, newline='', encoding="utf-8") as csvfile:
+            fetched_icaos = [row['ICAO'] for row in csv.DictReader(csvfile) if 'ICAO' in row]
+    elif args.icaos:
+        fetched_icaos = [args.icaos]
+
     # Input CSV files
     input_files = ["notam_fetch_ourairports.csv", "notam_fetch_faa.csv"]
 
@@ -52,4 +87,4 @@ if __name__ == "__main__":
     output_file = "notam_data.csv"
 
     # Merge and remove duplicates
-    merge_and_remove_duplicates(input_files, output_file)
+    merge_and_remove_duplicates(input_files, output_file, prune=args.prune, export=not args.no_export, fetched_icaos=fetched_icaos)
@@ -0,0 +1,121 @@
+import asyncio
+import datetime
+import time
+import httpx
+
+AVWX_BASE_URL = "https://avwx.rest/api"
+
+# Routine METARs are issued every hour; keep a report until the next one is due
+METAR_INTERVAL = 60 * 60
+ISSUE_DELAY = 5 * 60  # a new report usually shows up a few minutes after the hour
+MIN_TTL = 60  # once a report is overdue, ask again at most once a minute
+MAX_TTL = 15 * 60  # re-check at least this often so SPECIs are not missed for long
+MAX_STALE = 3 * 60 * 60  # how long an old report may be served while AVWX is failing
+
+
+class MetarReport:
+    def __init__(self, raw, observed, fetched_at, expires_at):
+        self.raw = raw
+        self.observed = observed
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+        self.stale = False
+
+
+def report_ttl(observed, now=None):
+    """Seconds to keep a report observed at `observed` (aware datetime or None)."""
+    if observed is None:
+        return MIN_TTL
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    next_due = observed + datetime.timedelta(seconds=METAR_INTERVAL + ISSUE_DELAY)
+    return max(MIN_TTL, min(MAX_TTL, (next_due - now).total_seconds()))
+
+
+def _observed_time(data):
+    try:
+        return datetime.datetime.fromisoformat(data["time"]["dt"].replace("Z", "+00:00"))
+    except (KeyError, TypeError, AttributeError, ValueError):
+        return None
+
+
+class MetarClient:
+    """Non-blocking AVWX METAR client for the bot.
+
+    Reports are cached per ICAO until the next routine METAR is due; concurrent lookups
+    of a station share one upstream request, and when AVWX fails the last report is
+    served (marked stale) for up to MAX_STALE seconds.
+    """
+
+    def __init__(self, token, timeout=10):
+        self.token = token
+        self.timeout = timeout
+        self._client = None
+        self._cache = {}
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_served = 0
+
+    def _http(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=AVWX_BASE_URL,
+                headers={"Authorization": f"Token {self.token}"},
+                timeout=self.timeout,
+            )
+        return self._client
+
+    async def _fetch(self, icao):
+        response = await self._http().get(f"/metar/{icao}")
+        response.raise_for_status()
+        data = response.json()
+        raw = data.get("raw")
+        if not raw:
+            raise ValueError(f"no METAR in AVWX answer for {icao}")
+        observed = _observed_time(data)
+        now = time.time()
+        return MetarReport(raw, observed, now, now + report_ttl(observed))
+
+    async def _refresh(self, icao):
+        try:
+            report = await self._fetch(icao)
+        except Exception as e:
+            cached = self._cache.get(icao)
+            if cached and time.time() - cached.fetched_at <= MAX_STALE:
+                print(f"Error fetching METAR for {icao}, serving the cached report: {e}")
+                self.stale_served += 1
+                cached.stale = True
+                cached.expires_at = time.time() + MIN_TTL  # do not retry AVWX on every lookup
+                return cached
+            raise
+        self._cache[icao] = report
+        return report
+
+    async def get(self, icao):
+        """Return the MetarReport for `icao`; raises if there is neither a fresh nor a usable stale one."""
+        icao = icao.strip().upper()
+        cached = self._cache.get(icao)
+        if cached and time.time() < cached.expires_at:
+            self.hits += 1
+            return cached
+
+        task = self._in_flight.get(icao)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._refresh(icao))
+            self._in_flight[icao] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(icao, None))
+        else:
+            self.coalesced += 1
+        # shield: one caller giving up must not cancel the request the others wait for
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                'stale_served': self.stale_served, 'cached': len(self._cache)}
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -1,4 +1,4 @@
-import requests
+import http_client
 import re
 import pandas as pd
 
@@ -104,7 +104,7 @@ def fetch_and_process_metar(icao, output_file):
     #url = f"https://tgftp.nws.noaa.gov/data/observations/metar/stations/{icao}.TXT"
     url = f"https://aviationweather.gov/data/metar/?id={icao}&hours=0&include_taf=yes"
     try:
-        response = requests.get(url)
+        response = http_client.get(url, timeout=30)
         response.raise_for_status()
         raw_metar = response.text.strip().splitlines()[-1]  # Take the latest METAR
         parsed_metar = [parse_metar(raw_metar)]
@@ -1,69 +1,58 @@
 import requests
+import http_client
+from http_cache import DEFAULT_CACHE_FILE, HttpCache
 import re
 import csv
-import sys
 import os
-from bs4 import BeautifulSoup
-import logging
+import argparse
+from functools import partial
+from urllib.parse import quote
+from notam_html import faa_notam_cells
 import logging
+from notam_fields import extract_notam_fields
+from concurrent_fetch import DEFAULT_MAX_WORKERS, DEFAULT_RATE_PER_HOST, HostRateLimiter, fetch_and_parse_in_order
 
 # Configure logging to output to both a file and the terminal
 log_file = 'notam_fetch_faa.log'  # Common log file for both scripts
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, mode='w'),  # Write to log file
-        logging.StreamHandler()  # Display logs in the terminal
-    ]
-)
-
-def extract_notam_fields(notam_text):
-    """Extract structured NOTAM fields from raw NOTAM text."""
-    notam_data = {
-        'NOTAM No': '',
-        'Q Code': '',
-        'From': '',
-        'To': '',
-        'Schedule': '',
-        'Text': '',
-        'Lower Limit': '',
-        'Upper Limit': '',
-        'Created Time': '',
-        'Farsi': ''
-    }
-
-    notam_text = re.sub(r'\s+', ' ', notam_text)
-
-    patterns = {
-        'NOTAM No': re.compile(r'([A-Z]\d{4}/\d{2})'),
-        'Q Code': re.compile(r'Q\) (.+?)(?=[A-Z]\)|\Z)'),
-        'From': re.compile(r'B\) (\d{10})'),
-        'To': re.compile(r'C\) (\d{10}(?:\sEST)?|PERM)'),
-        'Schedule': re.compile(r'D\) (.+?)(?=[A-Z]\)|\Z)'),
-        'Text': re.compile(r'E\) (.+?)(?=[A-Z]\)|\Z)'),
-        'Lower Limit': re.compile(r'F\) (\S+)'),
-        'Upper Limit': re.compile(r'G\) (\S+)')
-    }
-
-    for key, pattern in patterns.items():
-        match = pattern.search(notam_text)
-        if match:
-            notam_data[key] = match.group(1).strip()
-
-    created_match = re.search(r'CREATED:\s*(\d{2}\s\w{3}\s\d{4}\s\d{2}:\d{2}:\d{2})', notam_text)
-    if created_match:
-        notam_data['Created Time'] = created_match.group(1)
-
-    return notam_data
-
-def fetch_faa_notams(icao):
-    """Fetch NOTAMs from FAA for a given ICAO code."""
-    url = f"https://www.notams.faa.gov/dinsQueryWeb/queryRetrievalMapAction.do?reportType=Raw&retrieveLocId={icao}&actionType=notamRetrievalbyICAOs"
+def setup_logging():
+    """Log to both a file and the terminal when run as a script (importing the module configures nothing)."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file, mode='w'),  # Write to log file
+            logging.StreamHandler()  # Display logs in the terminal
+        ]
+    )
+
+# Location indicators on the A) line, e.g. "A) OIII" or "A) OIIE OIII"
+location_pattern = re.compile(r'A\)\s*((?:[A-Z]{4}\s*)+)')
+
+def notam_locations(notam_text, location_cell=''):
+    """Return the location indicators a NOTAM applies to, from its A) line or location cell."""
+    match = location_pattern.search(re.sub(r'\s+', ' ', notam_text))
+    if match:
+        return match.group(1).split()
+    return re.findall(r'\b[A-Z]{4}\b', location_cell)[:1]
+
+def faa_notams_url(icao):
+    """Return the DINS query URL for an ICAO code or a list of ICAO codes."""
+    loc_ids = quote(' '.join(icao)) if isinstance(icao, (list, tuple)) else icao
+    return f"https://www.notams.faa.gov/dinsQueryWeb/queryRetrievalMapAction.do?reportType=Raw&retrieveLocId={loc_ids}&actionType=notamRetrievalbyICAOs"
+
+def fetch_faa_notams(icao, rate_limiter=None, cache=None, max_age=0):
+    """Fetch NOTAMs from FAA for a given ICAO code, or a list of ICAO codes in one query."""
+    url = faa_notams_url(icao)
     headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"}
     try:
-        response = requests.get(url, headers=headers, timeout=30)
+        if cache:
+            response = cache.get(url, headers=headers, timeout=30, max_age=max_age, rate_limiter=rate_limiter)
+            logging.debug(f"FAA response for {icao}: {response.status}")
+            return icao, response.text
+        if rate_limiter:
+            rate_limiter.wait(url)
+        response = http_client.get(url, headers=headers, timeout=30)
         response.raise_for_status()
         return icao, response.text
     except requests.exceptions.RequestException as e:
@@ -71,31 +60,46 @@ def fetch_faa_notams(icao):
         return icao, None
 
 def parse_faa_notams(html_content, icao):
-    """Parse NOTAMs from the FAA HTML content."""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    notam_table = soup.select_one('#form1 div table tr td table:nth-of-type(3)')
-    if not notam_table:
+    """Parse NOTAMs from the FAA HTML content.
+
+    For a batched response `icao` is the list of requested ICAO codes; every NOTAM is
+    then tagged with an 'ICAO' key for each requested location on its A) line.
+    """
+    batch = list(icao) if isinstance(icao, (list, tuple)) else None
+    notam_rows = faa_notam_cells(html_content)
+    if notam_rows is None:
         logging.warning(f"No NOTAM table found for {icao} on FAA")
         return []
 
     notams_data = []
-    notam_rows = notam_table.find_all('tr')[1:]
 
-    for row in notam_rows:
-        cells = row.find_all('td')
-        if len(cells) < 2:
-            continue
-        notam_text = cells[1].get_text(strip=True)
+    for location_cell, notam_text in notam_rows:
         if not notam_text:
             continue
         notam_dict = extract_notam_fields(notam_text)
         if not notam_dict:
             continue
-        notams_data.append(notam_dict)
+        if batch is None:
+            notams_data.append(notam_dict)
+            continue
+
+        locations = [loc for loc in notam_locations(notam_text, location_cell) if loc in batch]
+        if not locations and len(batch) == 1:
+            locations = batch
+        if not locations:
+            logging.warning(f"Could not assign NOTAM {notam_dict['NOTAM No']} to any of {batch}")
+            continue
+        for location in locations:
+            notams_data.append(dict(notam_dict, ICAO=location))
+
+    if batch:
+        # Keep the rows in the order of the requested ICAO list
+        position = {location: i for i, location in enumerate(batch)}
+        notams_data.sort(key=lambda notam: position[notam['ICAO']])
 
     return notams_data
 
-def fetch_and_save_faa_notams(icao_list, output_file):
+def fetch_and_save_faa_notams(icao_list, output_file, max_workers=DEFAULT_MAX_WORKERS, rate=DEFAULT_RATE_PER_HOST, batch_size=1, cache_file=DEFAULT_CACHE_FILE, max_age=0, parse_workers=0):
     # Include 'ICAO' as the first column
     fieldnames = ['ICAO', 'NOTAM No', 'Q Code', 'From', 'To', 'Schedule', 'Text', 'Lower Limit', 'Upper Limit', 'Created Time', 'Farsi']
 
@@ -106,34 +110,71 @@ def fetch_and_save_faa_notams(icao_list, output_file):
         total_icao = len(icao_list)
         logging.info(f"Processing {total_icao} ICAO codes...")
 
-        for index, icao in enumerate(icao_list, start=1):
-            logging.info(f"[{index}/{total_icao}] Fetching NOTAMs for {icao}...")
-            response = fetch_faa_notams(icao)
-            if response:
-                _, html_content = response
-                if html_content:
-                    notams = parse_faa_notams(html_content, icao)
-                    for notam in notams:
-                        if isinstance(notam, dict):  # Ensure valid data is written
-                            # Add the ICAO column to the NOTAM data
+        # Pack several ICAO codes into each DINS query when batching is enabled
+        if batch_size > 1:
+            queries = [icao_list[i:i + batch_size] for i in range(0, total_icao, batch_size)]
+            logging.info(f"Packing up to {batch_size} ICAO codes per request ({len(queries)} requests)...")
+        else:
+            queries = icao_list
+        total_queries = len(queries)
+
+        logging.info(f"Fetching with up to {max_workers} concurrent requests...")
+        if max_workers > http_client.HOST_POOL_SIZES["https://www.notams.faa.gov"]:
+            http_client.set_host_pool_size("https://www.notams.faa.gov", max_workers)
+
+        # Responses are cached on disk and revalidated; pass cache_file=None to disable
+        cache = HttpCache(cache_file) if cache_file else None
+        fetch = partial(fetch_faa_notams, rate_limiter=HostRateLimiter(rate), cache=cache, max_age=max_age)
+
+        def fetch_page(icao):
+            return fetch(icao)[1]
+
+        def load_parsed(icao, html_content):
+            return cache.load_parsed(faa_notams_url(icao), html_content)
+
+        if parse_workers > 0:
+            logging.info(f"Parsing pages in {parse_workers} worker processes...")
+
+        # Requests run concurrently and pages are parsed as they arrive, but results come back in input order
+        results = fetch_and_parse_in_order(queries, fetch_page, parse_faa_notams, max_workers=max_workers,
+                                           parse_workers=parse_workers, load_parsed=load_parsed if cache else None)
+
+        for index, (icao, html_content, notams, reused) in enumerate(results, start=1):
+            logging.info(f"[{index}/{total_queries}] Processing NOTAMs for {icao}...")
+            if html_content:
+                if reused:
+                    logging.info(f"Content unchanged for {icao}, reusing parsed NOTAMs.")
+                elif cache:
+                    cache.store_parsed(faa_notams_url(icao), html_content, notams)
+                for notam in notams:
+                    if isinstance(notam, dict):  # Ensure valid data is written
+                        # Add the ICAO column to the NOTAM data (batched rows already carry it)
+                        if 'ICAO' not in notam:
                             notam['ICAO'] = icao
-                            writer.writerow(notam)
-                        else:
-                            logging.warning(f"Unexpected NOTAM format for {icao}: {notam}")
-                else:
-                    logging.warning(f"No HTML content found for {icao}.")
+                        writer.writerow(notam)
+                    else:
+                        logging.warning(f"Unexpected NOTAM format for {icao}: {notam}")
             else:
-                logging.warning(f"No NOTAMs found for {icao}.")
+                logging.warning(f"No HTML content found for {icao}.")
         logging.info(f"All NOTAMs saved to {output_file}.")
-
+        logging.info(f"HTTP: {http_client.stats}")
+        if cache:
+            cache.close()
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: notam_fetch_faa.py {ICAO | filename.csv}")
-        sys.exit(1)
-
-    input_arg = sys.argv[1]
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Fetch FAA NOTAMs and save them to notam_fetch_faa.csv")
+    parser.add_argument("source", metavar="ICAO | filename.csv", help="a single ICAO code or a CSV file with an ICAO column")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help=f"maximum concurrent requests (default: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_HOST, help=f"maximum requests per second to the host, 0 for no limit (default: {DEFAULT_RATE_PER_HOST})")
+    parser.add_argument("--batch-size", type=int, default=1, help="ICAO codes packed into each DINS query (default: 1, no batching)")
+    parser.add_argument("--max-age", type=float, default=0, help="reuse cached pages younger than this many seconds without a request (default: 0, always revalidate)")
+    parser.add_argument("--parse-workers", type=int, default=0, help="parse pages in this many worker processes while downloading continues (default: 0, parse in the main process)")
+    parser.add_argument("--no-cache", action="store_true", help=f"do not use the on-disk response cache ({DEFAULT_CACHE_FILE})")
+    args = parser.parse_args()
+
+    input_arg = args.source
     icao_list = []
 
     if os.path.isfile(input_arg):
@@ -144,4 +185,5 @@ if __name__ == "__main__":
     else:
         icao_list = [input_arg]
 
-    fetch_and_save_faa_notams(icao_list, "notam_fetch_faa.csv")
+    fetch_and_save_faa_notams(icao_list, "notam_fetch_faa.csv", max_workers=args.workers, rate=args.rate,
+                              cache_file=None if args.no_cache else DEFAULT_CACHE_FILE, max_age=args.max_age, parse_workers=args.parse_workers, batch_size=args.batch_size)
@@ -1,69 +1,45 @@
 import requests
-import re
+import http_client
+from http_cache import DEFAULT_CACHE_FILE, HttpCache
 import csv
-import sys
 import os
-from bs4 import BeautifulSoup
-import logging
+import argparse
+from functools import partial
+from notam_html import ourairports_notam_texts
 import logging
+from notam_fields import extract_notam_fields
+from concurrent_fetch import DEFAULT_MAX_WORKERS, DEFAULT_RATE_PER_HOST, HostRateLimiter, fetch_and_parse_in_order
 
 # Configure logging to output to both a file and the terminal
 log_file = 'notam_fetch_ourairports.log'  # Common log file for both scripts
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, mode='w'),  # Write to log file
-        logging.StreamHandler()  # Display logs in the terminal
-    ]
-)
-
-
-def extract_notam_fields(notam_text):
-    """Extract structured NOTAM fields from raw NOTAM text."""
-    notam_data = {
-        'NOTAM No': '',
-        'Q Code': '',
-        'From': '',
-        'To': '',
-        'Schedule': '',
-        'Text': '',
-        'Lower Limit': '',
-        'Upper Limit': '',
-        'Created Time': '',
-        'Farsi': ''
-    }
-
-    notam_text = re.sub(r'\s+', ' ', notam_text)
-    
-    patterns = {
-        'NOTAM No': re.compile(r'([A-Z]\d{4}/\d{2})'),
-        'Q Code': re.compile(r'Q\) (.+?)(?=[A-Z]\)|\Z)'),
-        'From': re.compile(r'B\) (\d{10})'),
-        'To': re.compile(r'C\) (\d{10}(?:\sEST)?|PERM)'),
-        'Schedule': re.compile(r'D\) (.+?)(?=[A-Z]\)|\Z)'),
-        'Text': re.compile(r'E\) (.+?)(?=[A-Z]\)|\Z)'),
-        'Lower Limit': re.compile(r'F\) (\S+)'),
-        'Upper Limit': re.compile(r'G\) (\S+)')
-    }
-
-    for key, pattern in patterns.items():
-        match = pattern.search(notam_text)
-        if match:
-            notam_data[key] = match.group(1).strip()
-
-    created_match = re.search(r'CREATED:\s*(\d{2}\s\w{3}\s\d{4}\s\d{2}:\d{2}:\d{2})', notam_text)
-    if created_match:
-        notam_data['Created Time'] = created_match.group(1)
-
-    return notam_data
-
-def fetch_ourairports_notams(icao):
+def setup_logging():
+    """Log to both a file and the terminal when run as a script (importing the module configures nothing)."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file, mode='w'),  # Write to log file
+            logging.StreamHandler()  # Display logs in the terminal
+        ]
+    )
+
+
+def ourairports_notams_url(icao):
+    """Return the OurAirports NOTAM page URL for an ICAO code."""
+    return f"https://ourairports.com/airports/{icao}/notams.html"
+
+def fetch_ourairports_notams(icao, rate_limiter=None, cache=None, max_age=0):
     """Fetch NOTAMs from OurAirports for a given ICAO code."""
-    url = f"https://ourairports.com/airports/{icao}/notams.html"
+    url = ourairports_notams_url(icao)
     try:
-        response = requests.get(url, timeout=30)
+        if cache:
+            response = cache.get(url, timeout=30, max_age=max_age, rate_limiter=rate_limiter)
+            logging.debug(f"OurAirports response for {icao}: {response.status}")
+            return icao, response.text
+        if rate_limiter:
+            rate_limiter.wait(url)
+        response = http_client.get(url, timeout=30)
         response.raise_for_status()
         return icao, response.text
     except requests.exceptions.RequestException as e:
@@ -72,12 +48,9 @@ def fetch_ourairports_notams(icao):
 
 def parse_ourairports_notams(html_content, icao):
     """Parse NOTAMs from the OurAirports HTML content."""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    notam_sections = soup.find_all('section', id=lambda x: x and x.startswith('notam-'))
     notams_data = []
 
-    for section in notam_sections:
-        notam_text = section.get_text(strip=True)
+    for notam_text in ourairports_notam_texts(html_content):
         notam_dict = extract_notam_fields(notam_text)
         if notam_dict:
             notams_data.append(notam_dict)
@@ -86,7 +59,7 @@ def parse_ourairports_notams(html_content, icao):
         logging.warning(f"No NOTAMs found for ICAO {icao} on OurAirports.")
     return notams_data
 
-def fetch_and_save_ourairports_notams(icao_list, output_file):
+def fetch_and_save_ourairports_notams(icao_list, output_file, max_workers=DEFAULT_MAX_WORKERS, rate=DEFAULT_RATE_PER_HOST, cache_file=DEFAULT_CACHE_FILE, max_age=0, parse_workers=0):
     # Include 'ICAO' as the first column
     fieldnames = ['ICAO', 'NOTAM No', 'Q Code', 'From', 'To', 'Schedule', 'Text', 'Lower Limit', 'Upper Limit', 'Created Time', 'Farsi']
 
@@ -97,34 +70,62 @@ def fetch_and_save_ourairports_notams(icao_list, output_file):
         total_icao = len(icao_list)
         logging.info(f"Processing {total_icao} ICAO codes...")
 
-        for index, icao in enumerate(icao_list, start=1):
-            logging.info(f"[{index}/{total_icao}] Fetching NOTAMs for {icao}...")
-            response = fetch_ourairports_notams(icao)
-            if response:
-                _, html_content = response
-                if html_content:
-                    notams = parse_ourairports_notams(html_content, icao)
-                    for notam in notams:
-                        if isinstance(notam, dict):  # Ensure valid data is written
-                            # Add the ICAO column to the NOTAM data
-                            notam['ICAO'] = icao
-                            writer.writerow(notam)
-                        else:
-                            logging.warning(f"Unexpected NOTAM format for {icao}: {notam}")
-                else:
-                    logging.warning(f"No HTML content found for {icao}.")
+        logging.info(f"Fetching with up to {max_workers} concurrent requests...")
+        if max_workers > http_client.HOST_POOL_SIZES["https://ourairports.com"]:
+            http_client.set_host_pool_size("https://ourairports.com", max_workers)
+
+        # Responses are cached on disk and revalidated; pass cache_file=None to disable
+        cache = HttpCache(cache_file) if cache_file else None
+        fetch = partial(fetch_ourairports_notams, rate_limiter=HostRateLimiter(rate), cache=cache, max_age=max_age)
+
+        def fetch_page(icao):
+            return fetch(icao)[1]
+
+        def load_parsed(icao, html_content):
+            return cache.load_parsed(ourairports_notams_url(icao), html_content)
+
+        if parse_workers > 0:
+            logging.info(f"Parsing pages in {parse_workers} worker processes...")
+
+        # Requests run concurrently and pages are parsed as they arrive, but results come back in input order
+        results = fetch_and_parse_in_order(icao_list, fetch_page, parse_ourairports_notams, max_workers=max_workers,
+                                           parse_workers=parse_workers, load_parsed=load_parsed if cache else None)
+
+        for index, (icao, html_content, notams, reused) in enumerate(results, start=1):
+            logging.info(f"[{index}/{total_icao}] Processing NOTAMs for {icao}...")
+            if html_content:
+                if reused:
+                    logging.info(f"Content unchanged for {icao}, reusing parsed NOTAMs.")
+                elif cache:
+                    cache.store_parsed(ourairports_notams_url(icao), html_content, notams)
+                for notam in notams:
+                    if isinstance(notam, dict):  # Ensure valid data is written
+                        # Add the ICAO column to the NOTAM data
+                        notam['ICAO'] = icao
+                        writer.writerow(notam)
+                    else:
+                        logging.warning(f"Unexpected NOTAM format for {icao}: {notam}")
             else:
-                logging.warning(f"No NOTAMs found for {icao}.")
+                logging.warning(f"No HTML content found for {icao}.")
         logging.info(f"All NOTAMs saved to {output_file}.")
+        logging.info(f"HTTP: {http_client.stats}")
+        if cache:
+            cache.close()
 
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: notam_fetch_ourairports.py {ICAO | filename.csv}")
-        sys.exit(1)
-
-    input_arg = sys.argv[1]
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Fetch OurAirports NOTAMs and save them to notam_fetch_ourairports.csv")
+    parser.add_argument("source", metavar="ICAO | filename.csv", help="a single ICAO code or a CSV file with an ICAO column")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help=f"maximum concurrent requests (default: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_HOST, help=f"maximum requests per second to the host, 0 for no limit (default: {DEFAULT_RATE_PER_HOST})")
+    parser.add_argument("--max-age", type=float, default=0, help="reuse cached pages younger than this many seconds without a request (default: 0, always revalidate)")
+    parser.add_argument("--parse-workers", type=int, default=0, help="parse pages in this many worker processes while downloading continues (default: 0, parse in the main process)")
+    parser.add_argument("--no-cache", action="store_true", help=f"do not use the on-disk response cache ({DEFAULT_CACHE_FILE})")
+    args = parser.parse_args()
+
+    input_arg = args.source
     icao_list = []
 
     if os.path.isfile(input_arg):
@@ -135,4 +136,5 @@ if __name__ == "__main__":
     else:
         icao_list = [input_arg]
 
-    fetch_and_save_ourairports_notams(icao_list, "notam_fetch_ourairports.csv")
+    fetch_and_save_ourairports_notams(icao_list, "notam_fetch_ourairports.csv", max_workers=args.workers, rate=args.rate,
+                                      cache_file=None if args.no_cache else DEFAULT_CACHE_FILE, max_age=args.max_age, parse_workers=args.parse_workers)
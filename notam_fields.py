@@ -0,0 +1,71 @@
+import re
+
+# Columns produced for every NOTAM, in CSV order (the fetch scripts add 'ICAO' in front)
+NOTAM_FIELDS = ['NOTAM No', 'Q Code', 'From', 'To', 'Schedule', 'Text', 'Lower Limit', 'Upper Limit', 'Created Time', 'Farsi']
+
+_notam_number = re.compile(r'[A-Z]\d{4}/\d{2}')
+_created = re.compile(r'CREATED:\s*(\d{2}\s\w{3}\s\d{4}\s\d{2}:\d{2}:\d{2})')
+_uppercase = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+# Items whose value runs until the next item marker
+_span_items = {'Q': 'Q Code', 'D': 'Schedule', 'E': 'Text'}
+
+# Items whose value is a single token right after the marker
+_value_items = {
+    'B': ('From', re.compile(r'(\d{10})')),
+    'C': ('To', re.compile(r'(\d{10}(?:\sEST)?|PERM)')),
+    'F': ('Lower Limit', re.compile(r'(\S+)')),
+    'G': ('Upper Limit', re.compile(r'(\S+)')),
+}
+
+
+def item_markers(notam_text):
+    """Return (letter, start, end) for every "X)" item marker, found in one scan of the text."""
+    markers = []
+    find = notam_text.find
+    position = find(')', 1)
+    while position != -1:
+        letter = notam_text[position - 1]
+        if letter in _uppercase:
+            markers.append((letter, position - 1, position + 1))
+        position = find(')', position + 1)
+    return markers
+
+
+def extract_notam_fields(notam_text):
+    """Extract structured NOTAM fields from raw NOTAM text."""
+    notam_data = dict.fromkeys(NOTAM_FIELDS, '')
+    notam_text = ' '.join(notam_text.split())
+
+    match = _notam_number.search(notam_text)
+    if match:
+        notam_data['NOTAM No'] = match.group()
+
+    created_at = notam_text.find('CREATED:')
+    while created_at != -1:
+        match = _created.match(notam_text, created_at)
+        if match:
+            notam_data['Created Time'] = match.group(1)
+            break
+        created_at = notam_text.find('CREATED:', created_at + 1)
+
+    items = item_markers(notam_text)
+    for index, (letter, start, end) in enumerate(items):
+        # Every item is written "X) value"; the first well-formed occurrence wins
+        if notam_text[end:end + 1] != ' ':
+            continue
+        if letter in _span_items:
+            key = _span_items[letter]
+            if notam_data[key]:
+                continue
+            stop = next((item[1] for item in items[index + 1:] if item[1] >= end + 2), len(notam_text))
+            notam_data[key] = notam_text[end + 1:stop].strip()
+        elif letter in _value_items:
+            key, pattern = _value_items[letter]
+            if notam_data[key]:
+                continue
+            match = pattern.match(notam_text, end + 1)
+            if match:
+                notam_data[key] = match.group(1)
+
+    return notam_data
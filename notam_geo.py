@@ -0,0 +1,215 @@
+import argparse
+import math
+import re
+import time
+from notam_qline import decode_q_lines
+from notam_store import DEFAULT_DB_FILE, NotamStore
+
+EARTH_RADIUS_NM = 3440.065
+CELL_DEGREES = 1.0  # grid cell size of SpatialIndex
+# Circles at least this large (999 NM means "the whole FIR") would cover hundreds of cells;
+# they are kept in one list and checked on every query instead
+LARGE_RADIUS_NM = 300
+
+_position = re.compile(r'^(\d{2})(\d{2})(?:(\d{2}))?([NS])(\d{3})(\d{2})(?:(\d{2}))?([EW])$')
+
+
+def parse_position(value):
+    """'3541N05119E' (Q-line style, optional seconds) or '35.68,51.32' -> (lat, lon) in degrees."""
+    value = value.strip().upper().replace(' ', '')
+    match = _position.match(value)
+    if match:
+        lat_deg, lat_min, lat_sec, ns, lon_deg, lon_min, lon_sec, ew = match.groups()
+        lat = int(lat_deg) + int(lat_min) / 60 + int(lat_sec or 0) / 3600
+        lon = int(lon_deg) + int(lon_min) / 60 + int(lon_sec or 0) / 3600
+        return (-lat if ns == 'S' else lat), (-lon if ew == 'W' else lon)
+    lat, lon = value.split(',')
+    return float(lat), float(lon)
+
+
+def distance_nm(lat1, lon1, lat2, lon2):
+    """Great-circle distance in nautical miles."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_NM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def segment_distance_nm(lat, lon, start, end):
+    """Distance in NM from a point to the route leg `start` -> `end` ((lat, lon) pairs).
+
+    Uses a flat projection around the leg, which is within about a mile for legs of a
+    few hundred NM away from the poles.
+    """
+    scale = math.cos(math.radians((start[0] + end[0]) / 2)) * 60
+    ax, ay = start[1] * scale, start[0] * 60
+    bx, by = end[1] * scale, end[0] * 60
+    px, py = lon * scale, lat * 60
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length))
+    closest_lat, closest_lon = (ay + t * dy) / 60, (ax + t * dx) / scale
+    return distance_nm(lat, lon, closest_lat, closest_lon)
+
+
+def _lon_margin(lat, distance):
+    """Degrees of longitude covering `distance` NM around latitude `lat`, or None near the poles."""
+    cos = math.cos(math.radians(min(abs(lat) + distance / 60, 90)))
+    return distance / (60 * cos) if cos > 0.01 else None
+
+
+def _cells(lat_min, lat_max, lon_min, lon_max):
+    for i in range(math.floor(lat_min / CELL_DEGREES), math.floor(lat_max / CELL_DEGREES) + 1):
+        for j in range(math.floor(lon_min / CELL_DEGREES), math.floor(lon_max / CELL_DEGREES) + 1):
+            yield i, j
+
+
+class SpatialIndex:
+    """Grid index over NOTAM circles (Q-line center and radius) with flight-level bounds.
+
+    Every circle is registered in the CELL_DEGREES cells its bounding box covers, so a
+    radius or route query only looks at circles sharing a cell with the query area and
+    then checks the exact distance. Circles of LARGE_RADIUS_NM and more are checked on
+    every query. Values without a position can be kept by group (the FIR), since a
+    query cannot rule them out.
+    """
+
+    def __init__(self, items, unplaced=()):
+        """`items` are (lat, lon, radius_nm, lower_fl, upper_fl, value) tuples; None radius/FL mean 0 and 000-999.
+
+        `unplaced` are (group, value) pairs of values without a position.
+        """
+        self._items = []
+        self._large = []
+        self._grid = {}
+        self._unplaced = {}
+        for group, value in unplaced:
+            self._unplaced.setdefault(group, []).append(value)
+        for lat, lon, radius, lower_fl, upper_fl, value in items:
+            radius = radius or 0
+            position = len(self._items)
+            self._items.append((lat, lon, radius, 0 if lower_fl is None else lower_fl,
+                                999 if upper_fl is None else upper_fl, value))
+            lon_margin = _lon_margin(lat, radius)
+            if radius >= LARGE_RADIUS_NM or lon_margin is None:
+                self._large.append(position)
+                continue
+            for cell in _cells(lat - radius / 60, lat + radius / 60, lon - lon_margin, lon + lon_margin):
+                self._grid.setdefault(cell, []).append(position)
+
+    def __len__(self):
+        return len(self._items)
+
+    def without_position(self, groups=None):
+        """Values without a position of `groups`, or of all groups."""
+        if groups is None:
+            groups = self._unplaced
+        return [value for group in groups for value in self._unplaced.get(group, ())]
+
+    def _candidates(self, lat_min, lat_max, lon_min, lon_max):
+        candidates = set(self._large)
+        for cell in _cells(lat_min, lat_max, lon_min, lon_max):
+            candidates.update(self._grid.get(cell, ()))
+        return candidates
+
+    def _matches(self, positions, distance, lower_fl, upper_fl):
+        """Values of the candidate circles within `distance(lat, lon)` + radius and the FL band, in insertion order."""
+        found = []
+        for position in sorted(positions):
+            lat, lon, radius, item_lower, item_upper, value = self._items[position]
+            if lower_fl is not None and item_upper < lower_fl:
+                continue
+            if upper_fl is not None and item_lower > upper_fl:
+                continue
+            if distance(lat, lon) <= radius:
+                found.append(value)
+        return found
+
+    def near(self, lat, lon, distance, lower_fl=None, upper_fl=None):
+        """Values of the circles that come within `distance` NM of (lat, lon)."""
+        lon_margin = _lon_margin(lat, distance)
+        if lon_margin is None:
+            candidates = range(len(self._items))
+        else:
+            candidates = self._candidates(lat - distance / 60, lat + distance / 60, lon - lon_margin, lon + lon_margin)
+        return self._matches(candidates, lambda item_lat, item_lon: distance_nm(lat, lon, item_lat, item_lon) - distance,
+                             lower_fl, upper_fl)
+
+    def along_route(self, points, width=0, lower_fl=None, upper_fl=None):
+        """Values of the circles within `width` NM of the route through `points` ((lat, lon) pairs), optionally between FLs."""
+        legs = list(zip(points, points[1:])) or [(points[0], points[0])]
+        candidates = set()
+        for start, end in legs:
+            lon_margin = _lon_margin(max(abs(start[0]), abs(end[0])), width)
+            if lon_margin is None:
+                candidates = range(len(self._items))
+                break
+            candidates |= self._candidates(min(start[0], end[0]) - width / 60, max(start[0], end[0]) + width / 60,
+                                           min(start[1], end[1]) - lon_margin, max(start[1], end[1]) + lon_margin)
+
+        def route_distance(lat, lon):
+            return min(segment_distance_nm(lat, lon, start, end) for start, end in legs) - width
+
+        return self._matches(candidates, route_distance, lower_fl, upper_fl)
+
+
+def notam_spatial_index(rows):
+    """SpatialIndex of NOTAM rows; the values are the rows.
+
+    Rows whose Q-line has no coordinates (or does not decode) are kept without a
+    position, grouped by FIR ('' when unknown).
+    """
+    items, unplaced = [], []
+    for row, q in zip(rows, decode_q_lines([row.get('Q Code', '') for row in rows])):
+        if q and q['lat'] is not None:
+            items.append((q['lat'], q['lon'], q['radius_nm'], q['lower_fl'], q['upper_fl'], row))
+        else:
+            unplaced.append((q['fir'] if q else '', row))
+    return SpatialIndex(items, unplaced)
+
+
+def parse_flight_levels(value):
+    """'100-300' -> (100, 300)."""
+    lower, upper = value.split('-')
+    return int(lower), int(upper)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find stored NOTAMs near a point or along a route (by Q-line position and radius)")
+    parser.add_argument("points", nargs="+", help="one position for a radius query, two or more for a route (3541N05119E or 35.68,51.32)")
+    parser.add_argument("--radius", type=float, default=0, help="NM around the point, or either side of the route (default: 0)")
+    parser.add_argument("--fl", type=parse_flight_levels, help="only NOTAMs overlapping this flight level band, e.g. 100-300")
+    parser.add_argument("--fir", action="append", type=str.upper,
+                        help="also list the NOTAMs of this FIR that have no position (can be repeated)")
+    parser.add_argument("--db", default=DEFAULT_DB_FILE, help=f"NOTAM store (default: {DEFAULT_DB_FILE})")
+    args = parser.parse_args()
+
+    store = NotamStore(args.db)
+    try:
+        now = time.time()
+        rows = [row for row in store.all_rows(with_validity=True) if row['Valid To'] > now]
+    finally:
+        store.close()
+    index = notam_spatial_index(rows)
+    points = [parse_position(point) for point in args.points]
+    lower_fl, upper_fl = args.fl or (None, None)
+    if len(points) == 1:
+        found = index.near(points[0][0], points[0][1], args.radius, lower_fl, upper_fl)
+    else:
+        found = index.along_route(points, args.radius, lower_fl, upper_fl)
+    print(f"{len(found)} of {len(rows)} current NOTAMs ({len(index)} with a position)")
+    for row in found:
+        print(f"{row['ICAO']} {row['NOTAM No']} {row['Q Code']} {row['From']}-{row['To']}: {row['Text'][:100]}")
+
+    # NOTAMs without a position cannot be placed, so they may apply anywhere in their FIR
+    unplaced = index.without_position(args.fir)
+    if args.fir:
+        print(f"\n{len(unplaced)} NOTAMs of {', '.join(args.fir)} without a position, not checked:")
+        for row in unplaced:
+            print(f"{row['ICAO']} {row['NOTAM No']} {row['Q Code']} {row['From']}-{row['To']}: {row['Text'][:100]}")
+    elif unplaced:
+        per_fir = {}
+        for row, q in zip(unplaced, decode_q_lines([row.get('Q Code', '') for row in unplaced])):
+            fir = q['fir'] if q else '?'
+            per_fir[fir] = per_fir.get(fir, 0) + 1
+        counts = ', '.join(f"{count} {fir}" for fir, count in sorted(per_fir.items()))
+        print(f"\n{len(unplaced)} NOTAMs without a position were not checked ({counts}); list them with --fir")
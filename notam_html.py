@@ -0,0 +1,91 @@
+import os
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # lxml is optional, BeautifulSoup's html.parser is always available
+    etree = None
+    lxml_html = None
+
+# 'lxml' builds the tree in C; 'bs4' is the original BeautifulSoup(html.parser) path and the fallback
+DEFAULT_BACKEND = os.getenv("NOTAM_HTML_BACKEND") or ("lxml" if lxml_html is not None else "bs4")
+
+FAA_TABLE_SELECTOR = '#form1 div table tr td table:nth-of-type(3)'
+OURAIRPORTS_SECTION_XPATH = "//section[starts-with(@id, 'notam-')]"
+
+
+def _lxml_text(element):
+    """Equivalent of BeautifulSoup's get_text(strip=True): stripped text nodes joined together."""
+    return ''.join(text.strip() for text in element.itertext())
+
+
+def _lxml_faa_table(document):
+    """Find the element matched by FAA_TABLE_SELECTOR without a descendant-axis XPath scan."""
+    form = document.get_element_by_id('form1', None)
+    if form is None:
+        return None
+    for table in form.iter('table'):
+        # table:nth-of-type(3)
+        if sum(1 for sibling in table.itersiblings('table', preceding=True)) != 2:
+            continue
+        # ... nested in "div table tr td" (in that order, walking up to #form1)
+        wanted = ['td', 'tr', 'table', 'div']
+        for ancestor in table.iterancestors():
+            if ancestor is form:
+                break
+            if ancestor.tag == wanted[0]:
+                wanted.pop(0)
+                if not wanted:
+                    return table
+    return None
+
+
+def _lxml_document(html_content):
+    """Parse with lxml, or return None so the caller falls back to BeautifulSoup."""
+    if lxml_html is None:
+        return None
+    try:
+        return lxml_html.fromstring(html_content)
+    except (ValueError, etree.ParserError):
+        return None
+
+
+def faa_notam_cells(html_content, backend=None):
+    """Return (location cell, NOTAM cell) text pairs from the FAA NOTAM table.
+
+    Returns None when the page has no NOTAM table at all.
+    """
+    document = _lxml_document(html_content) if (backend or DEFAULT_BACKEND) == "lxml" else None
+    if document is not None:
+        notam_table = _lxml_faa_table(document)
+        if notam_table is None:
+            return None
+        rows = []
+        for row in list(notam_table.iter('tr'))[1:]:
+            cells = list(row.iter('td'))
+            if len(cells) >= 2:
+                rows.append((_lxml_text(cells[0]), _lxml_text(cells[1])))
+        return rows
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    notam_table = soup.select_one(FAA_TABLE_SELECTOR)
+    if not notam_table:
+        return None
+    rows = []
+    for row in notam_table.find_all('tr')[1:]:
+        cells = row.find_all('td')
+        if len(cells) >= 2:
+            rows.append((cells[0].get_text(strip=True), cells[1].get_text(strip=True)))
+    return rows
+
+
+def ourairports_notam_texts(html_content, backend=None):
+    """Return the text of every section[id^=notam-] on an OurAirports NOTAM page."""
+    document = _lxml_document(html_content) if (backend or DEFAULT_BACKEND) == "lxml" else None
+    if document is not None:
+        return [_lxml_text(section) for section in document.xpath(OURAIRPORTS_SECTION_XPATH)]
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    notam_sections = soup.find_all('section', id=lambda x: x and x.startswith('notam-'))
+    return [section.get_text(strip=True) for section in notam_sections]
@@ -0,0 +1,138 @@
+import threading
+import time
+from notam_geo import notam_spatial_index
+from notam_validity import PERM_EPOCH, IntervalIndex
+from shamsi_date import convert_many_to_shamsi
+
+
+class NotamIndex:
+    """In-memory ICAO -> NOTAM rows index over the NOTAM store.
+
+    The index is built once and rebuilt on a background thread whenever another
+    connection commits to the store (the fetch/merge/translate scripts). A rebuild
+    swaps in a complete new dict, so readers never see a half-built index and
+    lookups never touch the disk.
+
+    Each ICAO also gets an IntervalIndex over the validity epochs the store parsed on
+    write, so expired NOTAMs are left out of `get()` and active-at/window queries do
+    not scan every row, and a SpatialIndex over the Q-line circles answers radius and
+    route queries across all ICAOs.
+    """
+
+    def __init__(self, store, gmt_difference=3.5, check_interval=5.0):
+        self.store = store
+        self.gmt_difference = gmt_difference
+        self.check_interval = check_interval
+        self._rows = {}  # ICAO -> (rows, IntervalIndex of their validity)
+        self._spatial = notam_spatial_index([])
+        self._versions = {}
+        self._signature = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _build(self):
+        rows_by_icao = {}
+        # One SELECT reads a consistent snapshot, even while a writer is committing
+        rows = self.store.all_rows(with_validity=True)
+        # Convert the dates once here instead of on every button press, each distinct value once
+        shamsi_from = convert_many_to_shamsi([row.get('From', 'N/A') for row in rows], self.gmt_difference)
+        shamsi_to = convert_many_to_shamsi([row.get('To', 'N/A') for row in rows], self.gmt_difference)
+        for row, from_text, to_text in zip(rows, shamsi_from, shamsi_to):
+            row['Shamsi From'] = from_text
+            row['Shamsi To'] = to_text
+            rows_by_icao.setdefault(row['ICAO'], []).append(row)
+        # Interval values are positions in the ICAO's list, so results keep the store order
+        intervals = {
+            icao: (icao_rows, IntervalIndex((row['Valid From'], row['Valid To'], position)
+                                            for position, row in enumerate(icao_rows)))
+            for icao, icao_rows in rows_by_icao.items()
+        }
+        return intervals, notam_spatial_index(rows)
+
+    def reload(self):
+        """Rebuild the index if the store changed since the last build. Returns True if it was rebuilt."""
+        with self._reload_lock:
+            signature = self.store.data_version()
+            if signature == self._signature:
+                return False
+            rows, spatial = self._build()
+            # Bump the version of every ICAO whose NOTAMs differ, so caches of the others stay valid
+            versions = dict(self._versions)
+            for icao in rows.keys() | self._rows.keys():
+                if rows.get(icao, ([],))[0] != self._rows.get(icao, ([],))[0]:
+                    versions[icao] = versions.get(icao, 0) + 1
+            self._rows, self._spatial, self._versions = rows, spatial, versions
+            self._signature = signature
+            return True
+
+    def _select(self, icao, start, end):
+        rows, intervals = self._rows.get(icao.strip().upper(), ([], None))
+        if intervals is None:
+            return []
+        return [rows[position] for position in sorted(intervals.overlapping(start, end))]
+
+    def get(self, icao, include_expired=False):
+        """Return the current and upcoming NOTAM rows for an ICAO code (an empty list if there are none)."""
+        if include_expired:
+            return self._rows.get(icao.strip().upper(), ([],))[0]
+        return self._select(icao, time.time(), PERM_EPOCH)
+
+    def active_at(self, icao, moment=None):
+        """Rows of `icao` valid at epoch `moment` (default: now)."""
+        moment = time.time() if moment is None else moment
+        return self._select(icao, moment, moment)
+
+    def active_between(self, icao, start, end):
+        """Rows of `icao` valid at any time in the epoch window [start, end]."""
+        return self._select(icao, start, end)
+
+    def near(self, lat, lon, distance, lower_fl=None, upper_fl=None, firs=None):
+        """Unexpired rows of any ICAO whose Q-line circle comes within `distance` NM of (lat, lon).
+
+        Returns (rows, unplaced): unplaced are the unexpired rows of `firs` (default: all
+        FIRs) whose Q-line has no position, which the query could not check.
+        """
+        now = time.time()
+        spatial = self._spatial
+        return ([row for row in spatial.near(lat, lon, distance, lower_fl, upper_fl) if row['Valid To'] > now],
+                [row for row in spatial.without_position(firs) if row['Valid To'] > now])
+
+    def along_route(self, points, width=0, lower_fl=None, upper_fl=None, firs=None):
+        """Unexpired rows whose Q-line circle comes within `width` NM of the route through `points`, optionally between FLs.
+
+        Returns (rows, unplaced) like near().
+        """
+        now = time.time()
+        spatial = self._spatial
+        return ([row for row in spatial.along_route(points, width, lower_fl, upper_fl) if row['Valid To'] > now],
+                [row for row in spatial.without_position(firs) if row['Valid To'] > now])
+
+    def version(self, icao):
+        """Changes whenever the NOTAM rows of `icao` change or one of them expires."""
+        icao = icao.strip().upper()
+        _, intervals = self._rows.get(icao, ([], None))
+        return self._versions.get(icao, 0), intervals.expired_count(time.time()) if intervals else 0
+
+    def _watch(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Error reloading NOTAM index: {e}")
+
+    def start(self):
+        """Build the index now and keep it up to date from a daemon thread.
+
+        If the first build fails the index starts empty and the thread retries.
+        """
+        try:
+            self.reload()
+        except Exception as e:
+            print(f"Error loading NOTAM index: {e}")
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="notam-index", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
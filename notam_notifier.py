@@ -0,0 +1,158 @@
+import asyncio
+import sqlite3
+import threading
+from telegram.error import Forbidden, RetryAfter, TelegramError
+from token_bucket import TokenBucket
+
+DEFAULT_SUBSCRIPTIONS_FILE = "subscriptions.sqlite"
+DEFAULT_POLL_INTERVAL = 30.0  # seconds between checks for new merge events
+MESSAGES_PER_MINUTE = 1200  # stay below Telegram's ~30 messages per second per bot
+MESSAGE_BURST = 20
+MAX_MESSAGE_LENGTH = 4000
+TEXT_PREVIEW = 200  # characters of the NOTAM text shown in a notification
+EVENTS_PER_POLL = 1000
+
+EVENT_LABELS = {'new': "New", 'replaced': "Changed", 'expired': "Cancelled/expired"}
+
+
+class Subscriptions:
+    """Chat -> ICAO subscriptions of the bot, kept in SQLite."""
+
+    def __init__(self, path=DEFAULT_SUBSCRIPTIONS_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS subscriptions (chat_id INTEGER NOT NULL, icao TEXT NOT NULL, PRIMARY KEY (icao, chat_id))"
+        )
+        self._conn.commit()
+
+    def add(self, chat_id, icao):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO subscriptions (chat_id, icao) VALUES (?, ?)", (chat_id, icao))
+
+    def remove(self, chat_id, icao=None):
+        """Remove one subscription, or all of a chat's subscriptions when `icao` is None."""
+        with self._lock, self._conn:
+            if icao is None:
+                self._conn.execute("DELETE FROM subscriptions WHERE chat_id = ?", (chat_id,))
+            else:
+                self._conn.execute("DELETE FROM subscriptions WHERE chat_id = ? AND icao = ?", (chat_id, icao))
+
+    def for_chat(self, chat_id):
+        with self._lock:
+            return [icao for (icao,) in self._conn.execute(
+                "SELECT icao FROM subscriptions WHERE chat_id = ? ORDER BY icao", (chat_id,))]
+
+    def chats_by_icao(self, icaos):
+        """ICAO -> subscribed chat ids, for the given ICAOs."""
+        chats = {}
+        with self._lock:
+            for icao in icaos:
+                for (chat_id,) in self._conn.execute("SELECT chat_id FROM subscriptions WHERE icao = ?", (icao,)):
+                    chats.setdefault(icao, []).append(chat_id)
+        return chats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def split_message(lines, max_length=MAX_MESSAGE_LENGTH):
+    """Join lines into messages of at most `max_length` characters, breaking between lines."""
+    messages, current = [], ""
+    for line in lines:
+        line = line[:max_length]
+        if current and len(current) + 1 + len(line) > max_length:
+            messages.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current:
+        messages.append(current)
+    return messages
+
+
+class NotamNotifier:
+    """Push the NOTAM changes recorded by the NotamStore to the chats subscribed to each ICAO.
+
+    Every poll reads the events added since the last one and sends each affected chat a
+    single summary (split only if it is too long), paced by a token bucket below
+    Telegram's limits and retried after a RetryAfter. Chats that blocked the bot are
+    unsubscribed.
+    """
+
+    def __init__(self, store, subscriptions, interval=DEFAULT_POLL_INTERVAL):
+        self.store = store
+        self.subscriptions = subscriptions
+        self.interval = interval
+        self.bucket = TokenBucket(MESSAGES_PER_MINUTE, burst=MESSAGE_BURST)
+        self.last_event_id = store.last_event_id()  # only changes made after the bot started
+        self.sent = 0
+        self.failed = 0
+
+    def _event_line(self, event, rows):
+        line = f"{EVENT_LABELS.get(event['kind'], event['kind'])}: {event['notam_no']}"
+        row = rows.get(event['notam_no'])
+        if row and event['kind'] != 'expired':
+            text = row.get('Text', '')
+            line += f" - {text[:TEXT_PREVIEW]}{'...' if len(text) > TEXT_PREVIEW else ''}"
+        return line
+
+    def build_messages(self, events):
+        """chat id -> messages summarising `events` for the ICAOs that chat subscribed to."""
+        events_by_icao = {}
+        for event in events:
+            events_by_icao.setdefault(event['icao'], []).append(event)
+        lines_by_chat = {}
+        for icao, chats in self.subscriptions.chats_by_icao(events_by_icao).items():
+            rows = {row['NOTAM No']: row for row in self.store.rows_for_icao(icao)}
+            lines = [f"NOTAM updates for {icao}:"] + [self._event_line(event, rows) for event in events_by_icao[icao]]
+            for chat_id in chats:
+                lines_by_chat.setdefault(chat_id, []).extend(lines + [""])
+        return {chat_id: split_message(lines) for chat_id, lines in lines_by_chat.items()}
+
+    async def _send(self, bot, chat_id, text):
+        for attempt in range(3):
+            await self.bucket.acquire()
+            try:
+                await bot.send_message(chat_id=chat_id, text=text)
+                self.sent += 1
+                return True
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                await asyncio.sleep(retry_after)
+            except Forbidden:
+                # The user blocked the bot or left the chat
+                self.subscriptions.remove(chat_id)
+                break
+            except TelegramError as e:
+                print(f"Error sending NOTAM update to {chat_id}: {e}")
+                break
+        self.failed += 1
+        return False
+
+    async def notify_once(self, bot):
+        """Send the changes since the last call. Returns the number of events handled."""
+        # NOTAMs whose validity ended since the last poll become 'expired' events too
+        await asyncio.to_thread(self.store.record_expiries)
+        events = await asyncio.to_thread(self.store.events_since, self.last_event_id, EVENTS_PER_POLL)
+        if not events:
+            return 0
+        messages = await asyncio.to_thread(self.build_messages, events)
+        for chat_id, texts in messages.items():
+            for text in texts:
+                await self._send(bot, chat_id, text)
+        self.last_event_id = events[-1]['id']
+        return len(events)
+
+    async def run(self, bot):
+        while True:
+            try:
+                # Drain backlogs of more than one page of events right away
+                while await self.notify_once(bot) >= EVENTS_PER_POLL:
+                    pass
+            except Exception as e:
+                print(f"Error sending NOTAM updates: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self):
+        return {'sent': self.sent, 'failed': self.failed, 'last_event_id': self.last_event_id}
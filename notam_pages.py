@@ -0,0 +1,59 @@
+MAX_MESSAGE_LENGTH = 4000  # Telegram rejects messages longer than 4096 characters
+
+
+class NotamPages:
+    """An airport's NOTAMs split into messages of at most `max_length` characters.
+
+    Pages break between NOTAM entries, so no entry (and no Markdown inside it) is cut
+    in half; only an entry too long for a page on its own is split, at a line break.
+    Pages are rendered the first time they are asked for and kept afterwards.
+    """
+
+    def __init__(self, header, rows, render_entry, max_length=MAX_MESSAGE_LENGTH):
+        self.header = header
+        self.rows = rows
+        self.render_entry = render_entry
+        self.max_length = max_length
+        self._entries = {}
+        self._pages = []
+        self._next = (0, 0)  # (entry index, offset in that entry) where the next unrendered page starts
+
+    def _entry(self, index):
+        if index not in self._entries:
+            self._entries[index] = self.render_entry(self.rows[index])
+        return self._entries[index]
+
+    def _render_next(self):
+        index, offset = self._next
+        number = len(self._pages) + 1
+        text = self.header if number == 1 else f"{self.header} ({number})"
+        text += "\n\n"
+        first = True
+        while index < len(self.rows):
+            entry = self._entry(index)[offset:]
+            separator = "" if first else "\n"
+            if len(text) + len(separator) + len(entry) <= self.max_length:
+                text += separator + entry
+                index, offset, first = index + 1, 0, False
+                continue
+            if first:
+                # A single entry longer than a page: cut it at the last line break that fits
+                room = self.max_length - len(text)
+                cut = entry.rfind("\n", 0, room) + 1 or room
+                text += entry[:cut]
+                offset += cut
+            break
+        self._pages.append(text)
+        self._next = (index, offset)
+
+    def page(self, number):
+        """Text of page `number` (0-based), or None past the last page."""
+        while len(self._pages) <= number and self._next[0] < len(self.rows):
+            self._render_next()
+        return self._pages[number] if 0 <= number < len(self._pages) else None
+
+    def has_next(self, number):
+        """Whether a page follows page `number`, without rendering it."""
+        if number + 1 < len(self._pages):
+            return True
+        return number + 1 == len(self._pages) and self._next[0] < len(self.rows)
@@ -0,0 +1,84 @@
+import re
+
+try:
+    import pandas as pd
+except ImportError:  # only needed to decode a pandas Series into a DataFrame
+    pd = None
+
+# FIR/QCODE/TRAFFIC/PURPOSE/SCOPE/LOWER/UPPER/COORDINATES, e.g. OIIX/QMRXX/IV/NBO/A /000/999/3354N05135E005.
+# Traffic and purpose are left out (or blank) by some offices, the scope is sometimes blank and the
+# coordinates and radius are often missing.
+Q_LINE_PATTERN = (
+    r'^\s*(?P<fir>[A-Z]{4})\s*/\s*Q(?P<subject>[A-Z]{2})(?P<condition>[A-Z]{2})\s*/'
+    r'(?:\s*(?P<traffic>[IVK]*)\s*/)?(?:\s*(?P<purpose>[NBOMK]*)\s*/)?'
+    r'\s*(?P<scope>[AEWK]*)\s*/\s*(?P<lower_fl>\d{3})\s*/\s*(?P<upper_fl>\d{3})\s*/?'
+    r'\s*(?:(?P<lat_deg>\d{2})(?P<lat_min>\d{2})(?P<lat_hemisphere>[NS])\s*'
+    r'(?P<lon_deg>\d{3})(?P<lon_min>\d{2})(?P<lon_hemisphere>[EW])\s*(?P<radius_nm>\d{3})?)?'
+)
+_q_line = re.compile(Q_LINE_PATTERN)
+
+# Decoded columns: strings, then flight levels and radius (int) and lat/lon in decimal degrees (float).
+# Missing values are None, or NaN/<NA> in a DataFrame.
+Q_COLUMNS = ['fir', 'subject', 'condition', 'traffic', 'purpose', 'scope',
+             'lower_fl', 'upper_fl', 'lat', 'lon', 'radius_nm']
+
+
+def _degrees(degrees, minutes, hemisphere):
+    value = int(degrees) + int(minutes) / 60
+    return -value if hemisphere in ('S', 'W') else value
+
+
+def decode_q_line(value):
+    """Q Code column value -> dict of Q_COLUMNS, or None if it is not a Q-line."""
+    match = _q_line.match(value or '')
+    if not match:
+        return None
+    parts = match.groupdict()
+    has_position = parts['lat_deg'] is not None
+    return {
+        'fir': parts['fir'],
+        'subject': parts['subject'],
+        'condition': parts['condition'],
+        'traffic': parts['traffic'] or '',
+        'purpose': parts['purpose'] or '',
+        'scope': parts['scope'],
+        'lower_fl': int(parts['lower_fl']),
+        'upper_fl': int(parts['upper_fl']),
+        'lat': _degrees(parts['lat_deg'], parts['lat_min'], parts['lat_hemisphere']) if has_position else None,
+        'lon': _degrees(parts['lon_deg'], parts['lon_min'], parts['lon_hemisphere']) if has_position else None,
+        'radius_nm': int(parts['radius_nm']) if parts['radius_nm'] else None,
+    }
+
+
+def _decode_series(values):
+    """Column-at-a-time decoding of a pandas Series with str.extract."""
+    parts = values.astype('string').str.extract(Q_LINE_PATTERN)
+    decoded = pd.DataFrame(index=values.index)
+    for column in ('fir', 'subject', 'condition', 'scope'):
+        decoded[column] = parts[column]
+    for column in ('traffic', 'purpose'):  # '' when left out, like decode_q_line
+        decoded[column] = parts[column].where(parts['fir'].isna(), parts[column].fillna(''))
+    for column in ('lower_fl', 'upper_fl', 'radius_nm'):
+        decoded[column] = pd.to_numeric(parts[column]).astype('Int64')
+    for axis in ('lat', 'lon'):
+        degrees = pd.to_numeric(parts[f'{axis}_deg']) + pd.to_numeric(parts[f'{axis}_min']) / 60
+        decoded[axis] = degrees.where(~parts[f'{axis}_hemisphere'].isin(['S', 'W']), -degrees).astype('float64')
+    return decoded[Q_COLUMNS]
+
+
+def decode_q_lines(values):
+    """Decode a whole Q Code column (list or pandas Series).
+
+    A Series is decoded with pandas' vectorized string methods into a DataFrame with
+    one typed column per Q_COLUMNS name. Any other iterable gives a list of dicts
+    (None for values that are not Q-lines), decoding each distinct value once.
+    """
+    if pd is not None and isinstance(values, pd.Series):
+        return _decode_series(values)
+    decoded = {}
+    results = []
+    for value in values:
+        if value not in decoded:
+            decoded[value] = decode_q_line(value) if isinstance(value, str) else None
+        results.append(decoded[value])
+    return results
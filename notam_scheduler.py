@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+import csv
+import heapq
+import logging
+import os
+import signal
+import threading
+import time
+import http_client
+from concurrent_fetch import DEFAULT_MAX_WORKERS, DEFAULT_RATE_PER_HOST, HostRateLimiter, fetch_in_order
+from http_cache import DEFAULT_CACHE_FILE, HttpCache, content_hash
+from notam_fetch_faa import faa_notams_url, fetch_faa_notams, parse_faa_notams
+from notam_fetch_ourairports import fetch_ourairports_notams, ourairports_notams_url, parse_ourairports_notams
+from notam_store import DEFAULT_DB_FILE, NotamStore
+from translation_cache import DEFAULT_CACHE_FILE as DEFAULT_TRANSLATION_CACHE, TranslationCache, dictionary_version
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Seconds between refreshes of an ICAO; the FIR and the busiest airports change most often
+DEFAULT_INTERVAL = 30 * 60
+DEFAULT_BUSY_INTERVAL = 10 * 60
+BUSY_ICAOS = ["OIIX", "OIII", "OIIE", "OIMM", "OISS", "OIFM", "OITT", "OIKB"]
+# Expired NOTAMs are moved to the archive table once an hour, a day after they expired
+DEFAULT_COMPACT_INTERVAL = 60 * 60
+DEFAULT_ARCHIVE_AFTER = 24 * 60 * 60
+
+
+def load_intervals(source, interval=DEFAULT_INTERVAL, busy_interval=DEFAULT_BUSY_INTERVAL, busy=BUSY_ICAOS):
+    """ICAO -> refresh interval in seconds, from an ICAO code or a CSV file with an ICAO column.
+
+    An optional 'Interval' column (minutes) overrides the default for that airport.
+    """
+    if not os.path.isfile(source):
+        rows = [{'ICAO': source}]
+    else:
+        with open(source, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    intervals = {}
+    for row in rows:
+        icao = (row.get('ICAO') or '').strip().upper()
+        if not icao:
+            continue
+        minutes = (row.get('Interval') or '').strip()
+        if minutes:
+            intervals[icao] = float(minutes) * 60
+        else:
+            intervals[icao] = busy_interval if icao in busy else interval
+    return intervals
+
+
+class NotamScheduler:
+    """Keep the NOTAM store up to date: fetch -> merge -> translate, in one long-running process.
+
+    Every ICAO is refreshed on its own interval. Due ICAOs are fetched from FAA and
+    OurAirports over the shared keep-alive session, with conditional requests through the
+    HTTP cache, and each airport is merged into the store as soon as both of its pages
+    are in. An airport whose pages are byte-for-byte the same as last time is skipped
+    without parsing or touching the store. New rows are then translated and
+    notam_data.csv is exported, only when something changed. Every `compact_interval`
+    seconds, NOTAMs that expired more than `archive_after` seconds ago are archived.
+    """
+
+    def __init__(self, intervals, db_file=DEFAULT_DB_FILE, output_file="notam_data.csv", cache_file=DEFAULT_CACHE_FILE,
+                 max_workers=DEFAULT_MAX_WORKERS, rate=DEFAULT_RATE_PER_HOST, prune=False, translate=True,
+                 dict_file="dict.for.gemini.csv", translation_cache_file=DEFAULT_TRANSLATION_CACHE,
+                 compact_interval=DEFAULT_COMPACT_INTERVAL, archive_after=DEFAULT_ARCHIVE_AFTER):
+        self.intervals = intervals
+        self.output_file = output_file
+        self.max_workers = max_workers
+        self.prune = prune
+        self.translate = translate
+        self.dict_file = dict_file
+        self.compact_interval = compact_interval
+        self.archive_after = archive_after
+        self._next_compaction = 0.0
+        self.store = NotamStore(db_file)
+        self.store.import_csv_if_empty(output_file)
+        self.http_cache = HttpCache(cache_file)
+        self.translation_cache = TranslationCache(translation_cache_file)
+        self.rate_limiter = HostRateLimiter(rate)
+        self._page_hashes = {}  # ICAO -> (FAA page hash, OurAirports page hash) last merged
+        self._due = [(0.0, icao) for icao in sorted(intervals)]
+        heapq.heapify(self._due)
+        self._stop = threading.Event()
+        for prefix in ("https://www.notams.faa.gov", "https://ourairports.com"):
+            if max_workers > http_client.HOST_POOL_SIZES.get(prefix, http_client.DEFAULT_POOL_SIZE):
+                http_client.set_host_pool_size(prefix, max_workers)
+
+    def _fetch(self, icao):
+        _, faa_page = fetch_faa_notams(icao, rate_limiter=self.rate_limiter, cache=self.http_cache)
+        _, ourairports_page = fetch_ourairports_notams(icao, rate_limiter=self.rate_limiter, cache=self.http_cache)
+        return icao, faa_page, ourairports_page
+
+    def _parse(self, url, page, parse, icao):
+        rows = self.http_cache.load_parsed(url, page)
+        if rows is None:
+            rows = parse(page, icao)
+            self.http_cache.store_parsed(url, page, rows)
+        return rows
+
+    def refresh(self, icaos):
+        """Fetch and merge `icaos` now. Returns the summed merge counts plus 'skipped'."""
+        totals = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0, 'skipped': 0}
+        # Airports are fetched concurrently and merged one by one as their pages arrive
+        for icao, faa_page, ourairports_page in fetch_in_order(icaos, self._fetch, max_workers=self.max_workers):
+            hashes = (content_hash(faa_page) if faa_page else None,
+                      content_hash(ourairports_page) if ourairports_page else None)
+            if hashes == self._page_hashes.get(icao):
+                totals['skipped'] += 1
+                continue
+
+            rows = []
+            # Same precedence as merge_notam_lists.py: FAA rows win over OurAirports rows
+            if ourairports_page:
+                rows.extend(self._parse(ourairports_notams_url(icao), ourairports_page, parse_ourairports_notams, icao))
+            if faa_page:
+                for row in self._parse(faa_notams_url(icao), faa_page, parse_faa_notams, icao):
+                    rows.append(dict(row, ICAO=row.get('ICAO') or icao))
+
+            # Only prune when both sources answered, so a failed request does not delete NOTAMs
+            counts = self.store.merge(rows, prune=self.prune and bool(faa_page and ourairports_page), prune_icaos=[icao])
+            for kind, count in counts.items():
+                totals[kind] += count
+            self._page_hashes[icao] = hashes
+        return totals
+
+    def _translate(self):
+        if not os.getenv("GEMINI_API_KEY"):
+            logging.warning("GEMINI_API_KEY is not set, skipping translation.")
+            return
+        from gemini_notam_in_farsi import update_farsi_column_async
+        asyncio.run(update_farsi_column_async(None, self.dict_file, store=self.store, cache=self.translation_cache))
+
+    def run_round(self, icaos):
+        start = time.monotonic()
+        totals = self.refresh(icaos)
+        changed = totals['inserted'] or totals['updated'] or totals['deleted']
+        if changed:
+            filled = self.translation_cache.apply_to_store(self.store, dictionary_version(self.dict_file))
+            if filled:
+                logging.info(f"Filled {filled} translations from the translation cache.")
+            if self.translate:
+                self._translate()
+            self.store.export_csv(self.output_file)
+        logging.info(f"Refreshed {len(icaos)} ICAOs in {time.monotonic() - start:.1f}s: {totals['inserted']} inserted, "
+                     f"{totals['updated']} updated, {totals['deleted']} deleted, {totals['skipped']} airports unchanged. "
+                     f"HTTP: {http_client.stats}")
+        return totals
+
+    def compact(self):
+        """Archive the NOTAMs that expired more than `archive_after` seconds ago."""
+        archived = self.store.compact(time.time() - self.archive_after)
+        if archived:
+            self.store.export_csv(self.output_file)
+            logging.info(f"Archived {archived} expired NOTAMs.")
+        self._next_compaction = time.time() + self.compact_interval
+        return archived
+
+    def run(self, once=False):
+        """Refresh ICAOs as they fall due until stop() is called (or one full round with `once`)."""
+        if once:
+            totals = self.run_round(sorted(self.intervals))
+            self.compact()
+            return totals
+        while not self._stop.is_set():
+            now = time.time()
+            due = []
+            while self._due and self._due[0][0] <= now:
+                due.append(heapq.heappop(self._due)[1])
+            if due:
+                try:
+                    self.run_round(due)
+                except Exception as e:
+                    logging.error(f"Refresh failed: {e}")
+                finished = time.time()
+                for icao in due:
+                    heapq.heappush(self._due, (finished + self.intervals[icao], icao))
+            if time.time() >= self._next_compaction:
+                try:
+                    self.compact()
+                except Exception as e:
+                    logging.error(f"Compaction failed: {e}")
+                    self._next_compaction = time.time() + self.compact_interval
+            wake = min(self._due[0][0], self._next_compaction) if self._due else self._next_compaction
+            self._stop.wait(max(wake - time.time(), 1))
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self.http_cache.close()
+        self.translation_cache.close()
+        self.store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep notam_data.sqlite up to date: fetch, merge and translate NOTAMs continuously")
+    parser.add_argument("source", metavar="ICAO | filename.csv", help="a single ICAO code or a CSV file with an ICAO column (and an optional Interval column in minutes)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL / 60, help=f"minutes between refreshes of an airport (default: {DEFAULT_INTERVAL // 60})")
+    parser.add_argument("--busy-interval", type=float, default=DEFAULT_BUSY_INTERVAL / 60, help=f"minutes between refreshes of the busy airports (default: {DEFAULT_BUSY_INTERVAL // 60})")
+    parser.add_argument("--busy", default=",".join(BUSY_ICAOS), help=f"comma-separated busy ICAO codes (default: {','.join(BUSY_ICAOS)})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help=f"maximum concurrent airports (default: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_HOST, help=f"maximum requests per second to each host, 0 for no limit (default: {DEFAULT_RATE_PER_HOST})")
+    parser.add_argument("--prune", action="store_true", help="delete stored NOTAMs of refreshed airports that both sources no longer list")
+    parser.add_argument("--no-translate", action="store_true", help="do not translate new NOTAMs with Gemini")
+    parser.add_argument("--archive-after", type=float, default=DEFAULT_ARCHIVE_AFTER / 3600, help=f"hours after expiry before a NOTAM is moved to the archive (default: {DEFAULT_ARCHIVE_AFTER // 3600})")
+    parser.add_argument("--once", action="store_true", help="refresh every airport once and exit")
+    args = parser.parse_args()
+
+    intervals = load_intervals(args.source, interval=args.interval * 60, busy_interval=args.busy_interval * 60,
+                               busy=[icao.strip().upper() for icao in args.busy.split(",") if icao.strip()])
+    scheduler = NotamScheduler(intervals, max_workers=args.workers, rate=args.rate, prune=args.prune, translate=not args.no_translate,
+                               archive_after=args.archive_after * 3600)
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    try:
+        scheduler.run(once=args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.close()
@@ -0,0 +1,70 @@
+import re
+
+# Arabic spellings of Persian letters and Persian/Arabic digits, folded so either spelling matches
+_fold = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ۀ': 'ه', 'ة': 'ه',
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+})
+# Words, keeping NOTAM compounds such as U/S, 11/29 or 2.18 together
+_token = re.compile(r'\w+(?:[/.]\w+)*')
+_part = re.compile(r'[/.]')
+_phrase = re.compile(r'"([^"]*)"?|(\S+)')
+_notam_number = re.compile(r'([A-Z])(\d{1,4})/(\d{2})')
+
+# Store fields covered by the index
+SEARCH_FIELDS = {'Text': 'text', 'Farsi': 'farsi'}
+
+
+def tokenize(text, parts=True):
+    """(position, term) pairs of `text`, upper-cased and folded.
+
+    With `parts`, a compound like 11/29 is also indexed as 11 and 29 at the same
+    position, so 'RWY 29 CLSD' matches 'RWY 11/29 CLSD'. Queries are tokenized
+    without parts, so 'U/S' only matches U/S.
+    """
+    for position, match in enumerate(_token.finditer((text or '').translate(_fold).upper())):
+        token = match.group()
+        yield position, token
+        if parts and _part.search(token):
+            for part in set(_part.split(token)) - {token}:
+                yield position, part
+
+
+def document_terms(text):
+    """term -> sorted positions of that term in `text`."""
+    terms = {}
+    for position, term in tokenize(text):
+        positions = terms.setdefault(term, [])
+        if not positions or positions[-1] != position:
+            positions.append(position)
+    return terms
+
+
+def parse_query(query):
+    """Search query -> phrases (lists of terms) that must all match.
+
+    Quoted text is a phrase; every other word is a phrase of its own:
+    'RWY 29 CLSD' needs all three words, '"ILS U/S" OIII' needs ILS directly before U/S, and OIII.
+    """
+    phrases = []
+    for quoted, word in _phrase.findall(query):
+        terms = [term for _, term in tokenize(quoted if quoted else word, parts=False)]
+        if terms:
+            phrases.append(terms)
+    return phrases
+
+
+def phrase_at(positions):
+    """Whether the terms whose position lists are `positions` occur one after another."""
+    first, rest = positions[0], [set(later) for later in positions[1:]]
+    return any(all(start + index + 1 in later for index, later in enumerate(rest)) for start in first)
+
+
+def notam_number_key(notam_no):
+    """Sort key putting later NOTAMs last: A5108/24 -> (24, 5108, 'A')."""
+    match = _notam_number.fullmatch(notam_no)
+    if not match:
+        return -1, 0, notam_no
+    series, number, year = match.groups()
+    return int(year), int(number), series
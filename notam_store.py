@@ -0,0 +1,527 @@
+import csv
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from notam_fields import NOTAM_FIELDS
+from notam_search import SEARCH_FIELDS, document_terms, notam_number_key, parse_query, phrase_at
+from notam_validity import validity
+
+# SQLite system of record for NOTAMs; notam_data.csv is exported from it for compatibility
+DEFAULT_DB_FILE = "notam_data.sqlite"
+
+CSV_FIELDS = ['ICAO'] + NOTAM_FIELDS
+
+# CSV column -> table column
+COLUMNS = {
+    'ICAO': 'icao',
+    'NOTAM No': 'notam_no',
+    'Q Code': 'q_code',
+    'From': 'from_time',
+    'To': 'to_time',
+    'Schedule': 'schedule',
+    'Text': 'text',
+    'Lower Limit': 'lower_limit',
+    'Upper Limit': 'upper_limit',
+    'Created Time': 'created_time',
+    'Farsi': 'farsi',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notams (
+    icao TEXT NOT NULL,
+    notam_no TEXT NOT NULL,
+    q_code TEXT NOT NULL DEFAULT '',
+    from_time TEXT NOT NULL DEFAULT '',
+    to_time TEXT NOT NULL DEFAULT '',
+    schedule TEXT NOT NULL DEFAULT '',
+    text TEXT NOT NULL DEFAULT '',
+    lower_limit TEXT NOT NULL DEFAULT '',
+    upper_limit TEXT NOT NULL DEFAULT '',
+    created_time TEXT NOT NULL DEFAULT '',
+    farsi TEXT NOT NULL DEFAULT '',
+    content_hash TEXT NOT NULL DEFAULT '',
+    valid_from INTEGER,  -- B)/C) as UTC epoch seconds, parsed once on write (see notam_validity.py)
+    valid_to INTEGER,
+    PRIMARY KEY (icao, notam_no)
+);
+-- The primary key also serves lookups by ICAO alone
+CREATE INDEX IF NOT EXISTS notams_validity ON notams (from_time, to_time);
+CREATE INDEX IF NOT EXISTS notams_created ON notams (created_time);
+-- What each merge changed, for consumers such as the bot's push notifications
+CREATE TABLE IF NOT EXISTS notam_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    icao TEXT NOT NULL,
+    notam_no TEXT NOT NULL,
+    kind TEXT NOT NULL,  -- 'new', 'replaced' (content changed) or 'expired' (valid_to passed, or no longer listed)
+    created_at REAL NOT NULL
+);
+-- Bookkeeping values, e.g. up to when expiries have been recorded as events
+CREATE TABLE IF NOT EXISTS notam_state (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+-- Expired NOTAMs moved out of the hot table by compact()
+CREATE TABLE IF NOT EXISTS notams_archive (
+    icao TEXT NOT NULL,
+    notam_no TEXT NOT NULL,
+    q_code TEXT NOT NULL DEFAULT '',
+    from_time TEXT NOT NULL DEFAULT '',
+    to_time TEXT NOT NULL DEFAULT '',
+    schedule TEXT NOT NULL DEFAULT '',
+    text TEXT NOT NULL DEFAULT '',
+    lower_limit TEXT NOT NULL DEFAULT '',
+    upper_limit TEXT NOT NULL DEFAULT '',
+    created_time TEXT NOT NULL DEFAULT '',
+    farsi TEXT NOT NULL DEFAULT '',
+    content_hash TEXT NOT NULL DEFAULT '',
+    valid_from INTEGER,
+    valid_to INTEGER,
+    archived_at REAL NOT NULL,
+    PRIMARY KEY (icao, notam_no)
+);
+-- Inverted index over the Text and Farsi of hot and archived NOTAMs, kept up to date on every write
+CREATE TABLE IF NOT EXISTS notam_terms (
+    term TEXT NOT NULL,
+    icao TEXT NOT NULL,
+    notam_no TEXT NOT NULL,
+    field TEXT NOT NULL,  -- 'Text' or 'Farsi'
+    positions TEXT NOT NULL,  -- space-separated token positions, for phrase queries
+    PRIMARY KEY (term, icao, notam_no, field)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS notam_terms_notam ON notam_terms (icao, notam_no);
+"""
+
+# PRAGMA user_version of a database _migrate() has brought up to date:
+# 1: estimated (EST) ends no longer count as the end of validity
+# 2: search postings (notam_terms) built for every hot and archived row
+SCHEMA_VERSION = 2
+
+EVENT_RETENTION = 7 * 24 * 3600  # seconds merge events are kept
+SEARCH_LIMIT = 50  # rows returned by search()
+
+# Columns added after the first release, created on databases that predate them
+ADDED_COLUMNS = {
+    'content_hash': "TEXT NOT NULL DEFAULT ''",
+    'valid_from': "INTEGER",
+    'valid_to': "INTEGER",
+}
+
+# Columns derived from the CSV fields on every write
+DERIVED_COLUMNS = ['content_hash', 'valid_from', 'valid_to']
+
+
+def clean_value(value):
+    """Normalise a CSV/pandas cell: None and NaN become '', everything else a stripped string."""
+    if value is None or value != value:
+        return ''
+    return str(value).strip()
+
+
+def content_hash(record):
+    """Hash of a cleaned record's NOTAM fields, ignoring the Farsi translation."""
+    return hashlib.sha1('\x1f'.join(record[:-1]).encode('utf-8')).hexdigest()
+
+
+def derived_values(record):
+    """DERIVED_COLUMNS values of a cleaned record."""
+    return [content_hash(record), *validity(record[3], record[4])]
+
+
+def clean_record(row):
+    """CSV row dict -> list of cleaned values in CSV_FIELDS order, or None without a key."""
+    record = [clean_value(row.get(field)) for field in CSV_FIELDS]
+    record[0] = record[0].upper()
+    return record if record[0] and record[1] else None
+
+
+class NotamStore:
+    """NOTAMs keyed by (ICAO, NOTAM No) in a WAL-mode SQLite database.
+
+    WAL lets the bot keep reading while the fetch/merge/translate scripts write.
+    """
+
+    def __init__(self, path=DEFAULT_DB_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # One process at a time, so two bots starting together do not both migrate
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._migrate()
+
+    def _migrate(self):
+        existing = {info[1] for info in self._conn.execute("PRAGMA table_info(notams)")}
+        for column, definition in ADDED_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE notams ADD COLUMN {column} {definition}")
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # EST ends used to be stored as hard ends: bring back what compact() archived because of
+            # that, then derive the validity of every row (also of rows older than the columns)
+            columns = ", ".join([COLUMNS[field] for field in CSV_FIELDS] + DERIVED_COLUMNS)
+            self._conn.execute(f"INSERT OR IGNORE INTO notams ({columns}) SELECT {columns} FROM notams_archive WHERE to_time LIKE '%EST'")
+            self._conn.execute("DELETE FROM notams_archive WHERE to_time LIKE '%EST'")
+            records = self._conn.execute("SELECT rowid, from_time, to_time FROM notams").fetchall()
+            self._conn.executemany("UPDATE notams SET valid_from = ?, valid_to = ? WHERE rowid = ?",
+                                   [(*validity(from_time, to_time), rowid) for rowid, from_time, to_time in records])
+        # Created here rather than in SCHEMA, which runs before the columns are added to old databases
+        self._conn.execute("CREATE INDEX IF NOT EXISTS notams_valid_to ON notams (valid_to)")
+        if version < 2:
+            # Databases that predate the search index (rebuilt from scratch in case it is partial)
+            self._conn.execute("DELETE FROM notam_terms")
+            self._index_text(self._conn.execute(
+                "SELECT icao, notam_no, text, farsi FROM notams UNION ALL SELECT icao, notam_no, text, farsi FROM notams_archive"
+            ).fetchall(), replace=False)
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _index_text(self, records, replace=True):
+        """(Re)build the search postings of (ICAO, NOTAM No, Text, Farsi) records. Runs inside the caller's transaction.
+
+        Without `replace` the records are known to have no postings yet.
+        """
+        deletes, postings = [], []
+        for icao, notam_no, *values in records:
+            if replace:
+                deletes.append((icao, notam_no))
+            for field, value in zip(SEARCH_FIELDS, values):
+                for term, positions in document_terms(value).items():
+                    postings.append((term, icao, notam_no, field, ' '.join(map(str, positions))))
+        self._conn.executemany("DELETE FROM notam_terms WHERE icao = ? AND notam_no = ?", deletes)
+        self._conn.executemany("INSERT INTO notam_terms (term, icao, notam_no, field, positions) VALUES (?, ?, ?, ?, ?)", postings)
+
+    def _reindex(self, keys, replace=True):
+        """Rebuild the search postings of the given (ICAO, NOTAM No) keys from the notams table."""
+        records = []
+        for key in keys:
+            found = self._conn.execute("SELECT icao, notam_no, text, farsi FROM notams WHERE icao = ? AND notam_no = ?", key).fetchone()
+            if found:
+                records.append(found)
+        self._index_text(records, replace)
+
+    def _select(self, where="", params=(), with_validity=False):
+        fields = CSV_FIELDS + (['Valid From', 'Valid To'] if with_validity else [])
+        columns = ", ".join(COLUMNS[field] for field in CSV_FIELDS) + (", valid_from, valid_to" if with_validity else "")
+        with self._lock:
+            records = self._conn.execute(f"SELECT {columns} FROM notams {where}", params).fetchall()
+        return [dict(zip(fields, record)) for record in records]
+
+    def upsert(self, rows):
+        """Insert or update rows keyed by (ICAO, NOTAM No).
+
+        An existing Farsi translation is kept unless the incoming row brings a new one.
+        Returns the number of rows written.
+        """
+        columns = [COLUMNS[field] for field in CSV_FIELDS] + DERIVED_COLUMNS
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns[2:] if column != 'farsi')
+        sql = (
+            f"INSERT INTO notams ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT(icao, notam_no) DO UPDATE SET {updates}, "
+            "farsi = CASE WHEN excluded.farsi != '' THEN excluded.farsi ELSE notams.farsi END"
+        )
+        values = []
+        for row in rows:
+            record = clean_record(row)
+            if record:
+                values.append(record + derived_values(record))
+        with self._lock, self._conn:
+            self._conn.executemany(sql, values)
+            self._reindex({(value[0], value[1]) for value in values})
+        return len(values)
+
+    def _stored_hashes(self, keys, table='notams'):
+        """(ICAO, NOTAM No) -> content hash for the given keys that are already stored in `table`."""
+        hashes = {}
+        for key in keys:
+            # One primary-key probe per fetched row, independent of the archive size
+            found = self._conn.execute(f"SELECT content_hash FROM {table} WHERE icao = ? AND notam_no = ?", key).fetchone()
+            if found:
+                hashes[key] = found[0]
+        return hashes
+
+    def merge(self, rows, prune=False, prune_icaos=None):
+        """Apply freshly fetched rows incrementally and return counts per kind of change.
+
+        Only keys that are new are inserted and only rows whose content hash changed are
+        updated (keeping their Farsi translation); unchanged rows are not written at all.
+        With `prune`, stored NOTAMs of the fetched ICAOs that are missing from `rows`
+        (cancelled or expired at the source) are deleted. The fetched ICAOs are
+        `prune_icaos`, or the ICAOs in `rows` if not given; pass them so an airport
+        whose sources list no NOTAMs at all is pruned too.
+        Each change is also recorded in notam_events ('new', 'replaced', 'expired') in
+        the same transaction; a pruned NOTAM whose expiry record_expiries() already
+        reported gets no second 'expired' event. NOTAMs that compact() archived and the source still lists
+        unchanged stay in the archive.
+        """
+        incoming = {}
+        for row in rows:
+            record = clean_record(row)
+            if record:
+                incoming[(record[0], record[1])] = record
+
+        columns = [COLUMNS[field] for field in CSV_FIELDS] + DERIVED_COLUMNS
+        insert_sql = f"INSERT INTO notams ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        # Every column but the key and the Farsi translation, which is only overwritten by a new one
+        updated = [column for column in columns[2:] if column != 'farsi']
+        update_sql = (
+            f"UPDATE notams SET {', '.join(f'{column} = ?' for column in updated)}, "
+            "farsi = CASE WHEN ? != '' THEN ? ELSE farsi END WHERE icao = ? AND notam_no = ?"
+        )
+
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+        with self._lock, self._conn:
+            stored = self._stored_hashes(incoming)
+            archived = self._stored_hashes([key for key in incoming if key not in stored], table='notams_archive')
+            inserts, updates, unarchived, events = [], [], [], []
+            now = time.time()
+            for key, record in incoming.items():
+                derived = derived_values(record)
+                record_hash = derived[0]
+                if key in archived:
+                    if archived[key] == record_hash:
+                        counts['unchanged'] += 1
+                        continue
+                    # Changed since it was archived: back into the hot table
+                    unarchived.append(key)
+                    inserts.append(record + derived)
+                    events.append((key[0], key[1], 'replaced', now))
+                elif key not in stored:
+                    inserts.append(record + derived)
+                    events.append((key[0], key[1], 'new', now))
+                elif stored[key] != record_hash or record[-1]:
+                    updates.append(record[2:-1] + derived + [record[-1], record[-1], key[0], key[1]])
+                    if stored[key] != record_hash:
+                        events.append((key[0], key[1], 'replaced', now))
+                else:
+                    counts['unchanged'] += 1
+            self._conn.executemany("DELETE FROM notams_archive WHERE icao = ? AND notam_no = ?", unarchived)
+            self._conn.executemany(insert_sql, inserts)
+            self._conn.executemany(update_sql, updates)
+            # Keys that were never stored have no postings to replace
+            self._reindex([(record[0], record[1]) for record in inserts if (record[0], record[1]) not in archived], replace=False)
+            self._reindex(unarchived + [(update[-2], update[-1]) for update in updates])
+            counts['inserted'], counts['updated'] = len(inserts), len(updates)
+
+            if prune:
+                deletes = []
+                checked = self._expiries_checked()
+                for icao in set(prune_icaos) if prune_icaos is not None else {key[0] for key in incoming}:
+                    for notam_no, valid_to in self._conn.execute("SELECT notam_no, valid_to FROM notams WHERE icao = ?", (icao,)):
+                        if (icao, notam_no) not in incoming:
+                            deletes.append((icao, notam_no))
+                            if checked is None or valid_to > checked:
+                                events.append((icao, notam_no, 'expired', now))
+                self._conn.executemany("DELETE FROM notams WHERE icao = ? AND notam_no = ?", deletes)
+                self._conn.executemany("DELETE FROM notam_terms WHERE icao = ? AND notam_no = ?", deletes)
+                counts['deleted'] = len(deletes)
+
+            self._add_events(events, now)
+        return counts
+
+    def _add_events(self, events, now):
+        self._conn.executemany("INSERT INTO notam_events (icao, notam_no, kind, created_at) VALUES (?, ?, ?, ?)", events)
+        if events:
+            self._conn.execute("DELETE FROM notam_events WHERE created_at < ?", (now - EVENT_RETENTION,))
+
+    def _expiries_checked(self):
+        """Epoch up to which expiries are recorded as events, or None before the first check."""
+        found = self._conn.execute("SELECT value FROM notam_state WHERE key = 'expiries_checked'").fetchone()
+        return found[0] if found else None
+
+    def _record_expiries(self, now):
+        checked = self._expiries_checked()
+        if checked is not None and now <= checked:
+            return 0
+        self._conn.execute("INSERT OR REPLACE INTO notam_state (key, value) VALUES ('expiries_checked', ?)", (now,))
+        if checked is None:  # the first check only sets the starting point
+            return 0
+        expired = self._conn.execute(
+            "SELECT icao, notam_no FROM notams WHERE valid_to > ? AND valid_to <= ?", (checked, now)).fetchall()
+        self._add_events([(icao, notam_no, 'expired', now) for icao, notam_no in expired], now)
+        return len(expired)
+
+    def record_expiries(self):
+        """Record an 'expired' event for every stored NOTAM whose valid_to passed since the last call.
+
+        Expiry is reported this way whether or not the merges prune, and each NOTAM only
+        once. The first call on a database only sets the starting point. Returns the
+        number of events recorded.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")  # another process may be checking at the same time
+            return self._record_expiries(time.time())
+
+    def events_since(self, last_id, limit=1000):
+        """Merge events with an id above `last_id`, oldest first, as dicts."""
+        with self._lock:
+            records = self._conn.execute(
+                "SELECT id, icao, notam_no, kind, created_at FROM notam_events WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, limit),
+            ).fetchall()
+        return [dict(zip(('id', 'icao', 'notam_no', 'kind', 'created_at'), record)) for record in records]
+
+    def last_event_id(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM notam_events").fetchone()[0]
+
+    def rows_for_icao(self, icao):
+        return self._select("WHERE icao = ? ORDER BY rowid", (icao.strip().upper(),))
+
+    def all_rows(self, with_validity=False):
+        """All rows; `with_validity` adds the 'Valid From'/'Valid To' epochs."""
+        return self._select("ORDER BY rowid", with_validity=with_validity)
+
+    def active_rows(self, start, end=None, icao=None):
+        """Rows valid at epoch `start`, or at any time in [start, end], optionally for one ICAO."""
+        where, params = "WHERE valid_from <= ? AND valid_to > ?", [start if end is None else end, start]
+        if icao:
+            where += " AND icao = ?"
+            params.append(icao.strip().upper())
+        return self._select(where + " ORDER BY rowid", params)
+
+    def compact(self, before):
+        """Move the rows that expired at or before epoch `before` to notams_archive.
+
+        Keeps the hot table (and everything built from it: the bot's index, the CSV
+        export) down to current and upcoming NOTAMs. Expiries are recorded first, and
+        rows archived before their expiry was reported get their 'expired' event here,
+        so every NOTAM leaving the hot table is reported once. Returns the number of
+        rows archived.
+        """
+        columns = ", ".join([COLUMNS[field] for field in CSV_FIELDS] + DERIVED_COLUMNS)
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            self._record_expiries(now)
+            checked = self._expiries_checked()
+            self._add_events([(icao, notam_no, 'expired', now) for icao, notam_no in self._conn.execute(
+                "SELECT icao, notam_no FROM notams WHERE valid_to <= ? AND valid_to > ?", (before, checked)).fetchall()], now)
+            archived = self._conn.execute(
+                f"INSERT OR REPLACE INTO notams_archive ({columns}, archived_at) "
+                f"SELECT {columns}, ? FROM notams WHERE valid_to <= ?",
+                (now, before),
+            ).rowcount
+            self._conn.execute("DELETE FROM notams WHERE valid_to <= ?", (before,))
+        return archived
+
+    def _postings(self, term, keys=None):
+        """(ICAO, NOTAM No) -> {field: positions string} for `term`, only for `keys` if given."""
+        if keys is None:
+            found = self._conn.execute(
+                "SELECT icao, notam_no, field, positions FROM notam_terms WHERE term = ?", (term,)).fetchall()
+        else:
+            found = []
+            for icao, notam_no in keys:
+                found.extend(self._conn.execute(
+                    "SELECT icao, notam_no, field, positions FROM notam_terms WHERE term = ? AND icao = ? AND notam_no = ?",
+                    (term, icao, notam_no)).fetchall())
+        postings = {}
+        for icao, notam_no, field, positions in found:
+            postings.setdefault((icao, notam_no), {})[field] = positions
+        return postings
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """NOTAMs (hot and archived) whose Text or Farsi matches every word and quoted phrase of `query`.
+
+        Returns (rows, total): up to `limit` matching rows, newest NOTAM number first, each
+        with an 'Archived' flag, and the number of matches. Only the postings of the
+        query terms are read, rarest term first, and only the returned rows are loaded,
+        so the cost follows the matches rather than the size of the archive.
+        """
+        phrases = parse_query(query)
+        if not phrases:
+            return [], 0
+        with self._lock:
+            frequency = {term: self._conn.execute("SELECT COUNT(*) FROM notam_terms WHERE term = ?", (term,)).fetchone()[0]
+                         for phrase in phrases for term in phrase}
+            postings = {}
+            keys = None
+            for term in sorted(frequency, key=frequency.get):
+                # Probe the remaining candidates one by one once they are fewer than the term's postings
+                postings[term] = self._postings(term, keys if keys is not None and len(keys) < frequency[term] else None)
+                keys = set(postings[term]) if keys is None else keys & set(postings[term])
+                if not keys:
+                    return [], 0
+
+            def phrase_matches(key, phrase):
+                # The words of a phrase have to follow each other within one field, Text or Farsi
+                return any(all(field in postings[term][key] for term in phrase)
+                           and phrase_at([[int(position) for position in postings[term][key][field].split()] for term in phrase])
+                           for field in SEARCH_FIELDS)
+
+            # Every key has all the words by now; only phrases need their positions checked
+            longer = [phrase for phrase in phrases if len(phrase) > 1]
+            matches = [key for key in keys if all(phrase_matches(key, phrase) for phrase in longer)]
+            matches.sort(key=lambda key: notam_number_key(key[1]), reverse=True)
+
+            rows = []
+            columns = ", ".join(COLUMNS[field] for field in CSV_FIELDS)
+            for key in matches[:limit]:
+                for table, archived in (('notams', False), ('notams_archive', True)):
+                    record = self._conn.execute(f"SELECT {columns} FROM {table} WHERE icao = ? AND notam_no = ?", key).fetchone()
+                    if record:
+                        rows.append(dict(zip(CSV_FIELDS, record), Archived=archived))
+                        break
+        return rows, len(matches)
+
+    def archived_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM notams_archive").fetchone()[0]
+
+    def untranslated(self):
+        """Rows whose Farsi column is still empty."""
+        return self._select("WHERE farsi = '' ORDER BY rowid")
+
+    def set_farsi(self, translations):
+        """Store translations given as (ICAO, NOTAM No, Farsi) tuples in one transaction."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE notams SET farsi = ? WHERE icao = ? AND notam_no = ?",
+                [(farsi, icao, notam_no) for icao, notam_no, farsi in translations],
+            )
+            self._reindex({(icao, notam_no) for icao, notam_no, _ in translations})
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM notams").fetchone()[0]
+
+    def data_version(self):
+        """Changes whenever another connection commits, so readers can cheaply detect new data."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def import_csv(self, csv_file):
+        """Upsert every row of a NOTAM CSV (e.g. an existing notam_data.csv)."""
+        with open(csv_file, newline='', encoding='utf-8') as f:
+            return self.upsert(csv.DictReader(f))
+
+    def import_csv_if_empty(self, csv_file):
+        """Seed a new database from the legacy CSV so switching to the store loses nothing."""
+        if self.count() == 0 and os.path.exists(csv_file):
+            return self.import_csv(csv_file)
+        return 0
+
+    def export_csv(self, csv_file):
+        """Write all rows to `csv_file` atomically (temp file + rename)."""
+        directory = os.path.dirname(os.path.abspath(csv_file))
+        fd, temp_path = tempfile.mkstemp(prefix=".notam_export_", suffix=".csv", dir=directory)
+        try:
+            columns = ", ".join(COLUMNS[field] for field in CSV_FIELDS)
+            with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f, self._lock:
+                writer = csv.writer(f)
+                writer.writerow(CSV_FIELDS)
+                # Stream straight from the cursor instead of building a dict per row
+                writer.writerows(self._conn.execute(f"SELECT {columns} FROM notams ORDER BY rowid"))
+            os.replace(temp_path, csv_file)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,88 @@
+import bisect
+import calendar
+
+# valid_to of NOTAMs without a fixed end (PERM, EST or no usable C) field): 9999-12-31 23:59:59 UTC
+PERM_EPOCH = 253402300799
+
+
+def notam_epoch(value, default=None):
+    """B)/C) value (YYMMDDhhmm[ss], optionally followed by EST) -> UTC epoch seconds.
+
+    PERM gives PERM_EPOCH; empty or unparseable values give `default`.
+    """
+    value = (value or '').strip().upper()
+    if value == 'PERM':
+        return PERM_EPOCH
+    digits = value.split(' ', 1)[0]
+    if len(digits) not in (10, 12) or not digits.isdigit():
+        return default
+    year, month, day, hour, minute = (int(digits[i:i + 2]) for i in range(0, 10, 2))
+    second = int(digits[10:12] or 0)
+    if not (1 <= month <= 12 and 1 <= day <= 31 and hour <= 24 and minute < 60 and second < 60):
+        return default
+    year += 2000 if year < 50 else 1900
+    return calendar.timegm((year, month, day, hour, minute, second, 0, 0, 0))
+
+
+def validity(from_value, to_value):
+    """(valid_from, valid_to) epochs of a NOTAM; an unknown start is 0.
+
+    An unknown, PERM or estimated (EST) end is PERM_EPOCH: a NOTAM whose end is only
+    estimated stays in force until it is cancelled or replaced, so it must not expire.
+    """
+    if (to_value or '').strip().upper().endswith('EST'):
+        return notam_epoch(from_value, 0), PERM_EPOCH
+    return notam_epoch(from_value, 0), notam_epoch(to_value, PERM_EPOCH)
+
+
+class IntervalIndex:
+    """Static index of [start, end) validity intervals answering overlap queries without a full scan.
+
+    Intervals are sorted by start and a max-of-end tree is kept over that order, so a query
+    bisects to the intervals that start early enough and only descends into subtrees whose
+    latest end is late enough: O(log n + matches).
+    """
+
+    def __init__(self, items):
+        """`items` are (start, end, value) tuples."""
+        items = sorted(items, key=lambda item: item[0])
+        self._starts = [item[0] for item in items]
+        self._values = [item[2] for item in items]
+        self._ends = [item[1] for item in items]
+        self._sorted_ends = sorted(self._ends)
+        self._size = 1
+        while self._size < len(items):
+            self._size *= 2
+        self._max_end = [float('-inf')] * (2 * self._size)
+        self._max_end[self._size:self._size + len(items)] = self._ends
+        for node in range(self._size - 1, 0, -1):
+            self._max_end[node] = max(self._max_end[2 * node], self._max_end[2 * node + 1])
+
+    def __len__(self):
+        return len(self._values)
+
+    def overlapping(self, start, end):
+        """Values of the intervals overlapping [start, end], in start order."""
+        count = bisect.bisect_right(self._starts, end)  # intervals starting no later than `end`
+        found = []
+        stack = [(1, 0, self._size)]
+        while stack:
+            node, low, high = stack.pop()
+            if low >= count or self._max_end[node] <= start:
+                continue
+            if node >= self._size:
+                found.append(low)
+                continue
+            middle = (low + high) // 2
+            stack.append((2 * node + 1, middle, high))
+            stack.append((2 * node, low, middle))
+        return [self._values[position] for position in found]
+
+    def active_at(self, moment):
+        """Values of the intervals with start <= moment < end."""
+        return self.overlapping(moment, moment)
+
+    def expired_count(self, moment):
+        """How many intervals ended at or before `moment`."""
+        return bisect.bisect_right(self._sorted_ends, moment)
+
@@ -0,0 +1,38 @@
+import threading
+
+
+class RenderCache:
+    """Rendered bot messages per ICAO, kept until that ICAO's NOTAMs change in the NotamIndex.
+
+    `render(icao)` builds the value (e.g. the message parts to send); it is called again
+    only after `index.version(icao)` moves on, so repeated taps on the same airport cost
+    a dict lookup.
+    """
+
+    def __init__(self, index, render):
+        self.index = index
+        self.render = render
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, icao):
+        icao = icao.strip().upper()
+        version = self.index.version(icao)
+        entry = self._entries.get(icao)
+        if entry is not None and entry[0] == version:
+            with self._lock:
+                self.hits += 1
+            return entry[1]
+        value = self.render(icao)
+        with self._lock:
+            self.misses += 1
+            self._entries[icao] = (version, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            hit_rate = self.hits / lookups * 100 if lookups else 0.0
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': round(hit_rate, 1), 'entries': len(self._entries)}
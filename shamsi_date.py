@@ -1,7 +1,27 @@
 import jdatetime
 import datetime
+import functools
 import sys
+import threading
+import time
 import ntplib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:  # only needed to return arrays/Series from convert_many_to_shamsi
+    np = None
+    pd = None
+
+# Distinct (date string, GMT difference) pairs kept by convert_to_shamsi
+SHAMSI_CACHE_SIZE = 4096
+
+# Queried together by NtpClock; the answer with the shortest round trip wins
+NTP_SERVERS = ["pool.ntp.org", "time.google.com", "time.cloudflare.com", "time.windows.com"]
+NTP_TIMEOUT = 2  # seconds to wait for each server
+NTP_RESYNC_INTERVAL = 60 * 60  # seconds between background resyncs
+NTP_RETRY_INTERVAL = 60  # seconds between background attempts while no server answers
 
 # Persian month names
 PERSIAN_MONTHS = [
@@ -16,19 +36,102 @@ PERSIAN_DAYS = [
     "چهارشنبه", "پنج‌شنبه", "جمعه"
 ]
 
-def get_ntp_time():
-    """Fetch the current time from an NTP server."""
-    try:
-        client = ntplib.NTPClient()
-        response = client.request('pool.ntp.org')
-        ntp_time = datetime.datetime.utcfromtimestamp(response.tx_time)
-        return ntp_time
-    except Exception as e:
-        print(f"Error fetching NTP time: {e}")
-        sys.exit(1)
+class NtpClock:
+    """UTC clock corrected by NTP without a network round trip per read.
+
+    `sync()` queries all servers concurrently and keeps the sample with the lowest
+    round-trip delay; `now()` is then the monotonic clock plus the measured offset.
+    Until a sync succeeds `now()` falls back to the system clock; it never waits for
+    the network.
+    """
+
+    def __init__(self, servers=NTP_SERVERS, port=123, timeout=NTP_TIMEOUT, resync_interval=NTP_RESYNC_INTERVAL,
+                 retry_interval=NTP_RETRY_INTERVAL):
+        self.servers = list(servers)
+        self.port = port
+        self.timeout = timeout
+        self.resync_interval = resync_interval
+        self.retry_interval = retry_interval
+        self.offset = None  # NTP time minus system time, in seconds
+        self.delay = None
+        self.server = None
+        self._base = None  # NTP time minus monotonic time
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _query(self, server):
+        try:
+            return server, ntplib.NTPClient().request(server, version=3, port=self.port, timeout=self.timeout)
+        except Exception as e:
+            print(f"Error fetching NTP time from {server}: {e}")
+            return server, None
+
+    def sync(self):
+        """Measure the offset now. Returns True if any server answered."""
+        with ThreadPoolExecutor(max_workers=len(self.servers)) as executor:
+            answers = [(server, response) for server, response in executor.map(self._query, self.servers) if response]
+        if not answers:
+            return False
+        server, response = min(answers, key=lambda answer: answer[1].delay)
+        with self._lock:
+            self._base = time.time() + response.offset - time.monotonic()
+            self.offset, self.delay, self.server = response.offset, response.delay, server
+        return True
+
+    def timestamp(self):
+        """Seconds since the epoch, NTP-corrected once synced."""
+        base = self._base
+        if base is None:
+            return time.time()
+        return time.monotonic() + base
+
+    def now(self):
+        """Current UTC time as a naive datetime, like datetime.utcnow()."""
+        return datetime.datetime.fromtimestamp(self.timestamp(), datetime.timezone.utc).replace(tzinfo=None)
+
+    def _watch(self):
+        while True:
+            synced = self.sync()
+            if not synced:
+                print("Error fetching NTP time: no server answered, using the system clock")
+            if self._stop.wait(self.resync_interval if synced else self.retry_interval):
+                return
+
+    def start(self):
+        """Sync and keep resyncing from a daemon thread. Returns at once; call it once per clock."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name="ntp-clock", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+_clock = None
+_clock_lock = threading.Lock()
 
+def get_ntp_time():
+    """Current UTC time from the shared NtpClock, started on first use.
+
+    The clock syncs in the background; until an NTP server answers this is the
+    system clock.
+    """
+    global _clock
+    if _clock is None:
+        with _clock_lock:
+            if _clock is None:
+                clock = NtpClock()
+                clock.start()
+                _clock = clock
+    return _clock.now()
+
+@functools.lru_cache(maxsize=SHAMSI_CACHE_SIZE)
 def convert_to_shamsi(date_str, gmt_difference):
-    """Convert the given date/time string to Shamsi date and adjust for GMT."""
+    """Convert the given date/time string to Shamsi date and adjust for GMT.
+
+    Results are memoized, since many NOTAMs share the same From/To timestamps.
+    """
     date_str = date_str.upper()
     suffix = ""
 
@@ -84,6 +187,34 @@ def convert_to_shamsi(date_str, gmt_difference):
     formatted_date = f"{persian_day_of_week} {shamsi_date.day} {persian_month_name} ({shamsi_date.month}) {shamsi_date.year} ساعت {formatted_time} محلی{suffix_text}"
     return formatted_date
 
+def convert_many_to_shamsi(values, gmt_difference, invalid="Invalid date"):
+    """Convert a whole column of NOTAM From/To values (list, ndarray or pandas Series).
+
+    Each distinct value is converted once. Missing cells (None, NaN) and 'N/A' become 'N/A',
+    values that cannot be parsed (including '') become `invalid`, as the bot showed them
+    before. Returns the same kind of container it was given.
+    """
+    converted = {}
+    results = []
+    for value in values:
+        if value is None or value != value or value == 'N/A':  # None, NaN
+            results.append('N/A')
+            continue
+        if not isinstance(value, str):  # pandas parses a column of timestamps as int64 or float64
+            value = str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+        if value not in converted:
+            try:
+                converted[value] = convert_to_shamsi(value, gmt_difference)
+            except Exception:
+                converted[value] = invalid
+        results.append(converted[value])
+
+    if pd is not None and isinstance(values, pd.Series):
+        return pd.Series(results, index=values.index, name=values.name, dtype=object)
+    if np is not None and isinstance(values, np.ndarray):
+        return np.array(results, dtype=object)
+    return results
+
 if __name__ == "__main__":
     if len(sys.argv) < 3:
         print("Usage: python shamsi_date.py <format/ntp> <date_string/GMT_difference> [GMT_difference]")
@@ -94,8 +225,11 @@ if __name__ == "__main__":
 
     try:
         if date_format == "ntp":
-            # Fetch time from NTP server
-            current_time = get_ntp_time()
+            # Fetch time from NTP server (one sync, rather than the shared background clock)
+            clock = NtpClock()
+            if not clock.sync():
+                print("Error fetching NTP time: no server answered, using the system clock")
+            current_time = clock.now()
             gmt_delta = datetime.timedelta(hours=gmt_difference)
             local_time = current_time + gmt_delta
             shamsi_date = jdatetime.datetime.fromgregorian(datetime=local_time)
@@ -1,10 +1,16 @@
 import os
 import sys
+import asyncio
 import csv
 import re
-import requests
 import datetime
-from shamsi_date import convert_to_shamsi
+from metar_client import MetarClient
+from notam_index import NotamIndex
+from notam_notifier import NotamNotifier, Subscriptions, split_message
+from notam_pages import NotamPages
+from notam_store import DEFAULT_DB_FILE, NotamStore
+from render_cache import RenderCache
+from user_log import UserLogSink
 
 from typing import Dict
 from telegram import (
@@ -23,6 +29,8 @@ from telegram.ext import (
     filters,
 )
 
+SEARCH_TEXT_PREVIEW = 300  # characters of each NOTAM shown in /search results
+
                 
 class BotRunner:
     def __init__(self, token: str, avwx_token: str):
@@ -31,6 +39,21 @@ class BotRunner:
         self.notam_file = "notam_data.csv"
         self.airport_names_file = "IRAN_AIRPORTS.csv"
         self.airport_names = self.load_airport_names()
+        # NOTAMs are read from the SQLite store; notam_data.csv seeds it on first run
+        self.notam_store = NotamStore(DEFAULT_DB_FILE)
+        self.notam_store.import_csv_if_empty(self.notam_file)
+        # ICAO -> NOTAM rows, rebuilt in the background whenever the store changes
+        self.notam_index = NotamIndex(self.notam_store)
+        # ICAO -> NOTAM message pages, re-rendered only when that ICAO's NOTAMs change
+        self.notam_messages = RenderCache(self.notam_index, self.render_notam_message)
+        # Cached, coalesced AVWX lookups that do not block the event loop
+        self.metar_client = MetarClient(avwx_token)
+        # user_log.csv is appended to in batches from a background thread
+        self.user_log = UserLogSink("user_log.csv")
+        # Users subscribed to an ICAO are sent the changes each merge records in the store
+        self.subscriptions = Subscriptions()
+        self.notifier = NotamNotifier(self.notam_store, self.subscriptions)
+        self.notifier_task = None
 
     def load_airport_names(self) -> Dict[str, str]:
         airport_names = {}
@@ -48,70 +71,61 @@ class BotRunner:
                 print(f"Error loading airport names: {e}")
         return airport_names
 
-    def fetch_notams_for_airport(self, icao: str) -> str:
-        notams = []
-        if os.path.exists(self.notam_file):
-            try:
-                with open(self.notam_file, mode='r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        if row['ICAO'].strip().upper() == icao:
-                            from_date = row.get('From', 'N/A')
-                            to_date = row.get('To', 'N/A')
-                            
-                            # Convert dates to Shamsi
-                            try:
-                                shamsi_from = convert_to_shamsi(from_date, 3.5) if from_date != 'N/A' else 'N/A'
-                            except Exception:
-                                shamsi_from = 'Invalid date'
-
-                            try:
-                                shamsi_to = convert_to_shamsi(to_date, 3.5) if to_date != 'N/A' else 'N/A'
-                            except Exception:
-                                shamsi_to = 'Invalid date'
-
-
-                            notam_entry = (
-                                "---------------------------\n"
-                                f"**NOTAM No:** {row.get('NOTAM No', 'N/A')}\n"
-                                f"**Q Code:** {row.get('Q Code', 'N/A')}\n"
-                                f"**From:** {row.get('From', 'N/A')}\n"
-                                f"**To:** {row.get('To', 'N/A')}\n"
-                                f"**Schedule:** {row.get('Schedule', 'N/A')}\n"
-                                f"**Text:** {row.get('Text', 'N/A')}\n"
-                                f"**Lower Limit:** {row.get('Lower Limit', 'N/A')}\n"
-                                f"**Upper Limit:** {row.get('Upper Limit', 'N/A')}\n\n"
-                                f"**از :** ({shamsi_from})\n"
-                                f"**تا :** ({shamsi_to})\n\n"
-                            )
-
-                            # Add Farsi translation if available
-                            farsi_translation = row.get('Farsi', '').strip()
-                            if farsi_translation:
-                                notam_entry += f"\n**شرح مختصر :**\n\n{farsi_translation}\n"
-
-                            notam_entry += "---------------------------\n\n"
-                            notams.append(notam_entry)
-
-            except Exception as e:
-                print(f"Error reading NOTAM data: {e}")
-        return "\n".join(notams) if notams else None
-
-    def get_airport_metar(self, icao: str) -> str:
-        base_url = "https://avwx.rest/api"
-        headers = {
-            "Authorization": f"Token {self.avwx_token}"
-        }
-
-        # URL for METAR
-        metar_url = f"{base_url}/metar/{icao}"
+    def format_notam_entry(self, row) -> str:
+        notam_entry = (
+            "---------------------------\n"
+            f"**NOTAM No:** {row.get('NOTAM No', 'N/A')}\n"
+            f"**Q Code:** {row.get('Q Code', 'N/A')}\n"
+            f"**From:** {row.get('From', 'N/A')}\n"
+            f"**To:** {row.get('To', 'N/A')}\n"
+            f"**Schedule:** {row.get('Schedule', 'N/A')}\n"
+            f"**Text:** {row.get('Text', 'N/A')}\n"
+            f"**Lower Limit:** {row.get('Lower Limit', 'N/A')}\n"
+            f"**Upper Limit:** {row.get('Upper Limit', 'N/A')}\n\n"
+            f"**از :** ({row['Shamsi From']})\n"
+            f"**تا :** ({row['Shamsi To']})\n\n"
+        )
 
+        # Add Farsi translation if available
+        farsi_translation = row.get('Farsi', '').strip()
+        if farsi_translation:
+            notam_entry += f"\n**شرح مختصر :**\n\n{farsi_translation}\n"
+
+        notam_entry += "---------------------------\n\n"
+        return notam_entry
+
+    def render_notam_message(self, icao: str):
+        """The NOTAMs of `icao` as NotamPages (rendered page by page on demand), or None if there are none."""
+        rows = self.notam_index.get(icao)
+        if not rows:
+            return None
+        airport_name = self.airport_names.get(icao, f"Unknown Airport ({icao})")
+        return NotamPages(f"**NOTAM(s) for {airport_name} ({icao})**", rows, self.format_notam_entry)
+
+    def notam_page(self, icao: str, number: int):
+        """Text and Prev/Next buttons of one NOTAM page, or (None, None) if `icao` has no NOTAMs."""
+        pages = self.notam_messages.get(icao)
+        if not pages:
+            return None, None
+        text = pages.page(number)
+        if text is None:  # the NOTAMs changed since the buttons were sent
+            number = 0
+            text = pages.page(number)
+
+        buttons = []
+        if number > 0:
+            buttons.append(InlineKeyboardButton("Previous", callback_data=f"NOTAMPAGE_{icao}_{number - 1}"))
+        if pages.has_next(number):
+            buttons.append(InlineKeyboardButton("Next", callback_data=f"NOTAMPAGE_{icao}_{number + 1}"))
+        return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
+    async def get_airport_metar(self, icao: str) -> str:
         # Fetch METAR from AVWX
         try:
-            metar_response = requests.get(metar_url, headers=headers, timeout=10)
-            metar_response.raise_for_status()
-            metar_data = metar_response.json()
-            metar_text = metar_data.get("raw", f"Was unable to fetch METAR for {icao}.")
+            report = await self.metar_client.get(icao)
+            metar_text = report.raw
+            if report.stale:
+                metar_text += "\n\n(AVWX is not responding, this is the last report received)"
         except Exception:
             metar_text = f"Was unable to fetch METAR for {icao}."
 
@@ -196,7 +210,6 @@ class BotRunner:
             await query.edit_message_text("Unsupported category selected.")
 
     def log_user_interaction(self, query: CallbackQuery, message_type: str, icao: str):
-        log_file = "user_log.csv"
         user = query.from_user
 
         # Extract user details
@@ -207,29 +220,17 @@ class BotRunner:
         phone = user.phone_number if hasattr(user, 'phone_number') else ""
         date_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        # Write to CSV file
-        log_exists = os.path.exists(log_file)
-        with open(log_file, mode='a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            if not log_exists:
-                writer.writerow(["Name", "Family", "UserID", "Username", "Phone", "DateTime", "MessageType", "Airport"])
-            writer.writerow([name, family, user_id, username, phone, date_time, message_type, icao])
+        # Queued for the log writer thread; dropped rather than waited for if it falls behind
+        self.user_log.write([name, family, user_id, username, phone, date_time, message_type, icao])
 
 
 
 
     async def send_notam(self, query: Update, context: ContextTypes.DEFAULT_TYPE, icao: str):
-        notams = self.fetch_notams_for_airport(icao)
-        if notams:
-            airport_name = self.airport_names.get(icao, f"Unknown Airport ({icao})")
-            message = f"**NOTAM(s) for {airport_name} ({icao})**\n\n{notams}"
-    
-            max_length = 4000
-            parts = [message[i:i + max_length] for i in range(0, len(message), max_length)]
-
-            await query.edit_message_text(parts[0], parse_mode="Markdown")
-            for part in parts[1:]:
-                 await query.message.reply_text(part, parse_mode="Markdown")
+        # Only the first page is rendered and sent; Next/Prev edit this message
+        text, reply_markup = self.notam_page(icao, 0)
+        if text:
+            await query.edit_message_text(text, parse_mode="Markdown", reply_markup=reply_markup)
         else:
             await query.edit_message_text(f"No NOTAMs found for {icao}.")
 
@@ -238,8 +239,19 @@ class BotRunner:
 
 
 
+    async def notam_page_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+
+        _, icao, number = query.data.split("_")
+        text, reply_markup = self.notam_page(icao, int(number))
+        if text:
+            await query.edit_message_text(text, parse_mode="Markdown", reply_markup=reply_markup)
+        else:
+            await query.edit_message_text(f"No NOTAMs found for {icao}.")
+
     async def send_metar(self, query: Update, context: ContextTypes.DEFAULT_TYPE, icao: str):
-        info = self.get_airport_metar(icao)
+        info = await self.get_airport_metar(icao)
         await query.edit_message_text(info, parse_mode="Markdown")
         self.log_user_interaction(query, "METAR", icao)
 
@@ -281,19 +293,65 @@ class BotRunner:
             return
 
         if category == "METAR":
-            info = self.get_airport_metar(icao)
+            info = await self.get_airport_metar(icao)
             await update.message.reply_text(info, parse_mode="Markdown")
         elif category == "NOTAM":
-            notams = self.fetch_notams_for_airport(icao)
-            if notams:
-                airport_name = self.airport_names.get(icao, f"Unknown Airport ({icao})")
-                message = f"**NOTAM(s) for {airport_name} ({icao})**\n\n{notams}"
-                await update.message.reply_text(message, parse_mode="Markdown")
+            text, reply_markup = self.notam_page(icao, 0)
+            if text:
+                await update.message.reply_text(text, parse_mode="Markdown", reply_markup=reply_markup)
             else:
                 await update.message.reply_text(f"No NOTAMs found for {icao}.")
         else:
             await update.message.reply_text("Unsupported category selected.")
 
+    async def subscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        icaos = [arg.strip().upper() for arg in context.args]
+        if not icaos or not all(re.fullmatch(r'[A-Z]{4}', icao) for icao in icaos):
+            await update.message.reply_text("Usage: /subscribe OIII [OIIE ...]")
+            return
+        for icao in icaos:
+            self.subscriptions.add(update.effective_chat.id, icao)
+        await update.message.reply_text(f"You will be notified of NOTAM changes for {', '.join(icaos)}.")
+
+    async def unsubscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        icaos = [arg.strip().upper() for arg in context.args]
+        if icaos:
+            for icao in icaos:
+                self.subscriptions.remove(update.effective_chat.id, icao)
+            await update.message.reply_text(f"Unsubscribed from {', '.join(icaos)}.")
+        else:
+            self.subscriptions.remove(update.effective_chat.id)
+            await update.message.reply_text("Unsubscribed from all airports.")
+
+    async def list_subscriptions(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        icaos = self.subscriptions.for_chat(update.effective_chat.id)
+        if icaos:
+            await update.message.reply_text(f"Subscribed to: {', '.join(icaos)}")
+        else:
+            await update.message.reply_text("No subscriptions. Use /subscribe OIII to get NOTAM changes for an airport.")
+
+    def format_search_result(self, row) -> str:
+        text = row.get('Text', '')
+        if len(text) > SEARCH_TEXT_PREVIEW:
+            text = text[:SEARCH_TEXT_PREVIEW] + "..."
+        archived = " (archived)" if row['Archived'] else ""
+        return f"{row['ICAO']} {row['NOTAM No']}{archived}\n{row.get('From', '')} - {row.get('To', '')}\n{text}\n"
+
+    async def search(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = " ".join(context.args)
+        if not query.strip():
+            await update.message.reply_text('Usage: /search RWY 29 CLSD  or  /search "ILS U/S"')
+            return
+        # The index lives in the store; the lookup runs off the event loop
+        rows, total = await asyncio.to_thread(self.notam_store.search, query)
+        if not rows:
+            await update.message.reply_text(f"No NOTAMs match {query}.")
+            return
+        header = f"{total} NOTAM(s) match {query}" + (f", showing the latest {len(rows)}:" if total > len(rows) else ":")
+        # Plain text: NOTAM text is full of characters Markdown would treat as formatting
+        for text in split_message([header, ""] + [self.format_search_result(row) for row in rows]):
+            await update.message.reply_text(text)
+
     async def other_callback_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         # This handler will catch "OTHER" callback data
         await self.handle_other_button(update, context)
@@ -301,16 +359,37 @@ class BotRunner:
     async def echo(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(update.message.text)
 
+    async def post_init(self, application):
+        self.notifier_task = asyncio.create_task(self.notifier.run(application.bot))
+
+    async def shutdown(self, application):
+        if self.notifier_task:
+            self.notifier_task.cancel()
+        print(f"NOTAM notifications: {self.notifier.stats()}")
+        print(f"NOTAM render cache: {self.notam_messages.stats()}")
+        print(f"METAR cache: {self.metar_client.stats()}")
+        await self.metar_client.close()
+        self.subscriptions.close()
+        self.user_log.close()
+        print(f"User log: {self.user_log.stats()}")
+
     def run_bot(self):
-        application = ApplicationBuilder().token(self.token).build()
+        self.notam_index.start()
+        self.user_log.start()
+        application = ApplicationBuilder().token(self.token).post_init(self.post_init).post_shutdown(self.shutdown).build()
 
         # Command handlers
         application.add_handler(CommandHandler("start", self.start))
+        application.add_handler(CommandHandler("subscribe", self.subscribe))
+        application.add_handler(CommandHandler("unsubscribe", self.unsubscribe))
+        application.add_handler(CommandHandler("subscriptions", self.list_subscriptions))
+        application.add_handler(CommandHandler("search", self.search))
 
         # Callback query handlers
         application.add_handler(CallbackQueryHandler(self.category_handler, pattern="^(METAR|NOTAM|FORECAST)$")) #
         application.add_handler(CallbackQueryHandler(self.pagination_handler, pattern="^page_\\d+$"))
         application.add_handler(CallbackQueryHandler(self.airport_handler, pattern="^(METAR|NOTAM)_[A-Z0-9]+$"))
+        application.add_handler(CallbackQueryHandler(self.notam_page_handler, pattern="^NOTAMPAGE_[A-Z0-9]+_\\d+$"))
         application.add_handler(CallbackQueryHandler(self.other_callback_handler, pattern="^OTHER$"))
 
         # Message handlers
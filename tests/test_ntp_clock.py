@@ -0,0 +1,133 @@
+"""NtpClock against a local UDP stand-in for an NTP server.
+
+Usage: python -m pytest tests
+"""
+import os
+import socket
+import sys
+import threading
+import time
+import ntplib
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import shamsi_date
+from shamsi_date import NtpClock
+
+SKEW = 120.0  # seconds the stand-in server is ahead of the system clock
+
+
+def serve(sock, skew, stop):
+    """Answer NTP client requests on `sock` with a clock `skew` seconds ahead (None: never answer)."""
+    while not stop.is_set():
+        try:
+            data, address = sock.recvfrom(256)
+        except socket.timeout:
+            continue
+        except OSError:
+            return
+        if skew is None:
+            continue
+        request = ntplib.NTPPacket()
+        request.from_data(data)
+        response = ntplib.NTPPacket(version=request.version, mode=4)
+        response.stratum = 2
+        response.orig_timestamp = request.tx_timestamp
+        response.recv_timestamp = response.tx_timestamp = ntplib.system_to_ntp_time(time.time() + skew)
+        sock.sendto(response.to_data(), address)
+
+
+def udp_server(skew):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(0.1)
+    stop = threading.Event()
+    thread = threading.Thread(target=serve, args=(sock, skew, stop), daemon=True)
+    thread.start()
+    return sock, stop, thread
+
+
+@pytest.fixture
+def ntp_port():
+    sock, stop, thread = udp_server(SKEW)
+    yield sock.getsockname()[1]
+    stop.set()
+    thread.join()
+    sock.close()
+
+
+@pytest.fixture
+def silent_port():
+    sock, stop, thread = udp_server(None)
+    yield sock.getsockname()[1]
+    stop.set()
+    thread.join()
+    sock.close()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_sync_measures_offset(ntp_port):
+    clock = NtpClock(servers=['127.0.0.1'], port=ntp_port, timeout=1)
+    assert clock.sync()
+    assert clock.server == '127.0.0.1'
+    assert abs(clock.offset - SKEW) < 1
+    assert abs(clock.timestamp() - (time.time() + SKEW)) < 1
+
+
+def test_now_is_system_clock_until_synced(silent_port):
+    clock = NtpClock(servers=['127.0.0.1'], port=silent_port, timeout=1)
+    assert not clock.sync()
+    assert clock.offset is None
+    assert abs(clock.timestamp() - time.time()) < 1
+
+
+def test_start_does_not_wait_for_the_network(silent_port):
+    clock = NtpClock(servers=['127.0.0.1'], port=silent_port, timeout=2)
+    started = time.monotonic()
+    clock.start()
+    try:
+        assert time.monotonic() - started < 0.5
+        assert abs(clock.timestamp() - time.time()) < 1
+    finally:
+        clock.stop()
+
+
+def test_start_syncs_in_the_background(ntp_port):
+    clock = NtpClock(servers=['127.0.0.1'], port=ntp_port, timeout=1)
+    clock.start()
+    try:
+        assert wait_for(lambda: clock.offset is not None)
+        assert abs(clock.timestamp() - (time.time() + SKEW)) < 1
+    finally:
+        clock.stop()
+
+
+def test_get_ntp_time_starts_one_shared_clock(ntp_port, monkeypatch):
+    clocks = []
+
+    def make_clock():
+        clock = NtpClock(servers=['127.0.0.1'], port=ntp_port, timeout=1)
+        clocks.append(clock)
+        return clock
+
+    monkeypatch.setattr(shamsi_date, 'NtpClock', make_clock)
+    monkeypatch.setattr(shamsi_date, '_clock', None)
+    threads = [threading.Thread(target=shamsi_date.get_ntp_time) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert len(clocks) == 1
+        assert wait_for(lambda: clocks[0].offset is not None)
+        assert abs((shamsi_date.get_ntp_time() - clocks[0].now()).total_seconds()) < 1
+    finally:
+        clocks[0].stop()
@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Asyncio token bucket refilled continuously at `per_minute` tokens a minute.
+
+    It holds up to `burst` tokens (default: a whole minute's worth).
+    """
+
+    def __init__(self, per_minute, burst=None):
+        per_minute = float(per_minute) if per_minute and per_minute > 0 else 0.0
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst) if burst and per_minute else per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount=1):
+        """Wait until `amount` tokens are available and take them."""
+        if not self.capacity:
+            return
+        amount = min(amount, self.capacity)  # a request larger than the bucket waits for a full bucket
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount):
+        """Take `amount` more tokens (or give them back if negative) once the real usage is known."""
+        if self.capacity:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Persistent Farsi translations keyed by normalised NOTAM text
+DEFAULT_CACHE_FILE = "translation_cache.sqlite"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # evict least recently used translations above this size
+
+# Bump when the prompts in gemini_notam_in_farsi.py change, so old translations are not reused
+PROMPT_VERSION = 1
+
+# The CREATED/SOURCE trailer differs between re-issues of the same NOTAM and is not translated
+_trailer = re.compile(r'\s*CREATED:.*$', re.DOTALL)
+
+
+def normalize_text(text):
+    """Text as the translation sees it: CREATED/SOURCE trailer removed, whitespace collapsed."""
+    return ' '.join(_trailer.sub('', text or '').upper().split())
+
+
+def dictionary_version(dict_file):
+    """Short hash of the glossary file, so editing the dictionary invalidates cached translations."""
+    if not os.path.exists(dict_file):
+        return 'none'
+    with open(dict_file, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def translation_key(text, dict_version, prompt_version=PROMPT_VERSION):
+    key = f"{prompt_version}\x1f{dict_version}\x1f{normalize_text(text)}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class TranslationCache:
+    """SQLite cache of Farsi translations with hit/miss counters and size-based LRU eviction."""
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                farsi TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed_at)")
+        self._conn.commit()
+
+    def get(self, text, dict_version):
+        """Return the cached translation of `text`, or None."""
+        key = translation_key(text, dict_version)
+        with self._lock:
+            row = self._conn.execute("SELECT farsi FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE translations SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, text, dict_version, farsi):
+        self.put_many([(text, farsi)], dict_version)
+
+    def put_many(self, translations, dict_version):
+        """Store (text, farsi) pairs in one transaction."""
+        now = time.time()
+        values = []
+        for text, farsi in translations:
+            normalized = normalize_text(text)
+            values.append((translation_key(text, dict_version), normalized, farsi, now, now,
+                           len(normalized.encode('utf-8')) + len(farsi.encode('utf-8'))))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations (key, text, farsi, created_at, accessed_at, size) VALUES (?, ?, ?, ?, ?, ?)",
+                values,
+            )
+            self._conn.commit()
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, size in self._conn.execute("SELECT key, size FROM translations ORDER BY accessed_at").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM translations WHERE key = ?", (key,))
+                total -= size
+                self.evictions += 1
+            self._conn.commit()
+
+    def apply_to_store(self, store, dict_version):
+        """Fill untranslated rows of a NotamStore from the cache. Returns the number of rows filled."""
+        updates = []
+        for row in store.untranslated():
+            farsi = self.get(row['Text'], dict_version)
+            if farsi:
+                updates.append((row['ICAO'], row['NOTAM No'], farsi))
+        if updates:
+            store.set_farsi(updates)
+        return len(updates)
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM translations").fetchone()
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0.0
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': round(hit_rate, 1),
+                'evictions': self.evictions, 'entries': entries, 'bytes': size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
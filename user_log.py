@@ -0,0 +1,129 @@
+import csv
+import datetime
+import os
+import queue
+import threading
+import time
+
+USER_LOG_HEADER = ["Name", "Family", "UserID", "Username", "Phone", "DateTime", "MessageType", "Airport"]
+
+DEFAULT_MAX_QUEUE = 10000  # rows waiting to be written; further rows are dropped
+DEFAULT_BATCH_SIZE = 100  # write once this many rows are waiting...
+DEFAULT_FLUSH_INTERVAL = 5.0  # ...or after this many seconds
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024  # rotate the file above this size, and at the start of each day
+
+
+class UserLogSink:
+    """Append user interaction rows to a CSV file from a background thread.
+
+    `write()` only puts the row on a bounded in-memory queue, so handlers never wait for
+    the disk; when the queue is full the row is dropped and counted. The writer thread
+    appends rows in batches and rotates the file (user_log.csv -> user_log.<date-time>.csv)
+    when it grows past `max_bytes` or was last written on an earlier day. `close()`
+    writes whatever is still queued.
+    """
+
+    def __init__(self, path="user_log.csv", header=USER_LOG_HEADER, max_queue=DEFAULT_MAX_QUEUE,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.header = header
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def write(self, row):
+        """Queue a row without blocking. Returns False if it was dropped."""
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _rotate_if_needed(self):
+        if not os.path.exists(self.path):
+            return
+        stat = os.stat(self.path)
+        last_write = datetime.datetime.fromtimestamp(stat.st_mtime)
+        if stat.st_size < self.max_bytes and last_write.date() == datetime.date.today():
+            return
+        stem, ext = os.path.splitext(self.path)
+        target = f"{stem}.{last_write.strftime('%Y%m%d-%H%M%S')}{ext}"
+        counter = 1
+        while os.path.exists(target):
+            target = f"{stem}.{last_write.strftime('%Y%m%d-%H%M%S')}-{counter}{ext}"
+            counter += 1
+        os.replace(self.path, target)
+
+    def _flush(self, rows):
+        if not rows:
+            return
+        try:
+            self._rotate_if_needed()
+            log_exists = os.path.exists(self.path)
+            with open(self.path, mode='a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                if not log_exists:
+                    writer.writerow(self.header)
+                writer.writerows(rows)
+            self.written += len(rows)
+        except Exception as e:
+            print(f"Error writing user log: {e}")
+
+    def _drain(self, rows, timeout):
+        """Move queued rows into `rows`, waiting up to `timeout` seconds for the first one."""
+        try:
+            row = self._queue.get(timeout=timeout)
+            while True:
+                if row is not None:  # None only wakes the thread up for close()
+                    rows.append(row)
+                if len(rows) >= self.batch_size:
+                    return
+                row = self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _run(self):
+        rows = []
+        deadline = None
+        while not self._stop.is_set():
+            timeout = self.flush_interval if deadline is None else max(deadline - time.monotonic(), 0)
+            self._drain(rows, timeout)
+            if rows and deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(rows) >= self.batch_size or (rows and time.monotonic() >= deadline):
+                self._flush(rows)
+                rows, deadline = [], None
+        # Shutdown: write the current batch and everything still queued
+        while True:
+            self._drain(rows, 0)
+            if len(rows) < self.batch_size:
+                break
+            self._flush(rows)
+            rows = []
+        self._flush(rows)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="user-log", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=10):
+        """Stop the writer thread after it has written every queued row."""
+        self._stop.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        return {'written': self.written, 'dropped': self.dropped, 'queued': self._queue.qsize()}
+